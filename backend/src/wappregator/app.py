@@ -1,29 +1,52 @@
 from typing import Annotated, Callable
 from collections.abc import AsyncIterator
 import datetime
+import json
 import os
 import contextlib
 import logging
 
 import fastapi
 from fastapi.middleware import cors
+import pydantic
 import socketio
 import valkey.asyncio as valkey
 from wapprecommon import model
 from wapprecommon.constants import VALKEY_URL
 
 from wappregator import socket, radios, utils
-from wappregator.radios.base import CACHE_TTL_SECONDS
+from wappregator.radios import SCHEDULE_MAX_AGE_SECONDS
 
 ALLOWED_ORIGINS = os.environ.get("ALLOWED_ORIGINS")
 ALLOWED_ORIGINS_LIST = ALLOWED_ORIGINS.split(",") if ALLOWED_ORIGINS else []
+# Coordinate SocketIO emits and rooms between backend replicas through Valkey
+SOCKETIO_VALKEY_MANAGER = os.environ.get("SOCKETIO_VALKEY_MANAGER", "").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+# Rendered /schedule responses are thrown away along with the in-memory schedules
+SCHEDULE_RENDER_CACHE_SIZE = 256
+HISTORY_DEFAULT_LIMIT = 100
+HISTORY_MAX_LIMIT = 1000
+HISTORY_MAX_AGE_SECONDS = 10
 
 logger = logging.getLogger(__name__)
 
 valkey_pool = None
 
+schedule_adapter = pydantic.TypeAdapter(dict[str, list[model.Program]])
+schedule_renders = utils.RenderedResponseCache(
+    radios.SCHEDULE_MEMORY_TTL_SECONDS, SCHEDULE_RENDER_CACHE_SIZE
+)
 
-sio = socketio.AsyncServer(async_mode="asgi", cors_allowed_origins=ALLOWED_ORIGINS_LIST)
+
+sio = socketio.AsyncServer(
+    async_mode="asgi",
+    cors_allowed_origins=ALLOWED_ORIGINS_LIST,
+    client_manager=socket.ValkeyManager() if SOCKETIO_VALKEY_MANAGER else None,
+)
 
 
 @contextlib.asynccontextmanager
@@ -76,6 +99,18 @@ if ALLOWED_ORIGINS_LIST:
 wrapped_app = socketio.ASGIApp(sio, app)
 
 
+def cache_control(ttl: int) -> str:
+    """Get the value of a cache control header for a public, cacheable response.
+
+    Args:
+        ttl: Cache max age in seconds.
+
+    Returns:
+        The header value.
+    """
+    return f"public, max-age={ttl}"
+
+
 def cacheable(ttl: int) -> Callable[[fastapi.Response], None]:
     """Generate a dependency that sets cache control headers for a response.
 
@@ -84,7 +119,7 @@ def cacheable(ttl: int) -> Callable[[fastapi.Response], None]:
     """
 
     def dep(response: fastapi.Response) -> None:
-        response.headers["Cache-Control"] = f"public, max-age={ttl}"
+        response.headers["Cache-Control"] = cache_control(ttl)
 
     return dep
 
@@ -95,16 +130,18 @@ async def get_radios() -> dict[str, model.Radio]:
     return radios.radios()
 
 
-@app.get("/schedule", dependencies=[fastapi.Depends(cacheable(CACHE_TTL_SECONDS))])
+@app.get("/schedule", response_model=dict[str, list[model.Program]])
 async def get_schedule(
+    request: fastapi.Request,
     client: ValkeyClient,
     include: Annotated[list[str] | None, fastapi.Query()] = None,
     start: datetime.datetime | None = None,
     end: datetime.datetime | None = None,
     min_previous: int | None = None,
     min_upcoming: int | None = None,
-) -> dict[str, list[model.Program]]:
+) -> fastapi.Response:
     """Get schedules for Wappuradios."""
+    generation = radios.schedule_cache.generation
     schedule = await radios.schedule(client)
     filt = utils.ScheduleFilter(
         start=start,
@@ -112,10 +149,32 @@ async def get_schedule(
         min_previous=min_previous,
         min_upcoming=min_upcoming,
     )
-    return {k: filt(v) for k, v in schedule.items() if include is None or k in include}
+    # Many different queries (especially ones relative to the current time) end up
+    # selecting the same programs, so we key the rendered responses by the selection
+    bounds = tuple(
+        (k, *filt.bounds(v))
+        for k, v in schedule.items()
+        if include is None or k in include
+    )
+    rendered = schedule_renders.get(bounds, generation)
+    if rendered is None:
+        body = schedule_adapter.dump_json(
+            {
+                k: schedule[k].programs[start_idx:end_idx]
+                for k, start_idx, end_idx in bounds
+            }
+        )
+        rendered = utils.RenderedResponse.render(body)
+        schedule_renders.set(bounds, generation, rendered)
+
+    return rendered.to_response(
+        request, {"Cache-Control": cache_control(SCHEDULE_MAX_AGE_SECONDS)}
+    )
 
 
-@app.get("/offseason", dependencies=[fastapi.Depends(cacheable(CACHE_TTL_SECONDS))])
+@app.get(
+    "/offseason", dependencies=[fastapi.Depends(cacheable(SCHEDULE_MAX_AGE_SECONDS))]
+)
 async def get_offseason(client: ValkeyClient) -> bool:
     """Check whether we are in off-season."""
     schedule = await radios.schedule(client)
@@ -134,6 +193,42 @@ async def get_now_playing(client: ValkeyClient) -> dict[str, model.Song | None]:
     return await radios.now_playing(client)
 
 
+@app.get("/history/{radio_id}", response_model=model.SongHistory)
+async def get_history(
+    request: fastapi.Request,
+    client: ValkeyClient,
+    radio_id: str,
+    start: datetime.datetime | None = None,
+    end: datetime.datetime | None = None,
+    limit: Annotated[
+        int, fastapi.Query(ge=1, le=HISTORY_MAX_LIMIT)
+    ] = HISTORY_DEFAULT_LIMIT,
+) -> fastapi.Response:
+    """Get the songs a Wappuradio has played, newest first."""
+    if radio_id not in radios.radios():
+        raise fastapi.HTTPException(status_code=404, detail="Unknown radio")
+    if start is not None and start.tzinfo is None:
+        start = start.replace(tzinfo=utils.DEFAULT_TZ)
+    if end is not None and end.tzinfo is None:
+        end = end.replace(tzinfo=utils.DEFAULT_TZ)
+
+    songs, next_end = await radios.history(client, radio_id, start, end, limit)
+    # The songs are stored as JSON already, so there's no need to validate and dump
+    # them again
+    body = b"".join(
+        [
+            b'{"songs":[',
+            b",".join(songs),
+            b'],"next_end":',
+            json.dumps(next_end.isoformat() if next_end else None).encode(),
+            b"}",
+        ]
+    )
+    return utils.RenderedResponse.render(body).to_response(
+        request, {"Cache-Control": cache_control(HISTORY_MAX_AGE_SECONDS)}
+    )
+
+
 @app.get("/health/live")
 async def live_check() -> str:
     """Check whether the app is alive."""
@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import time
+
+import valkey.asyncio as valkey
+from wapprecommon import listeners
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_CHANGE_FLUSH_INTERVAL_SECONDS = 0.25
+# Nobody flicks through the stations this fast on purpose, so clients get at most
+# this many writes per window
+CHANNEL_CHANGE_RATE_LIMIT = 20
+CHANNEL_CHANGE_RATE_LIMIT_WINDOW_SECONDS = 10
+
+
+class ChannelChangeBuffer:
+    """Buffers the clients' channel changes and writes them to Valkey in batches.
+
+    Only the latest channel of each client is kept, so a client flicking through the
+    stations causes at most one write per flush. Disconnects go through the buffer as
+    well, so that they can't race with a pending channel change.
+
+    Clients changing channels too fast have their writes deferred until their rate
+    limit window resets. Their latest channel is still kept, so it's written in the
+    end.
+    """
+
+    def __init__(self, backend_id: str, radio_ids: list[str]) -> None:
+        """Initialize the buffer.
+
+        Args:
+            backend_id: The ID of the backend the clients are connected to.
+            radio_ids: The IDs of the radio stations clients can listen to.
+        """
+        self.backend_id = backend_id
+        self.valid_ids = {*radio_ids, listeners.NOT_LISTENING_ID}
+        self._pending: dict[str, str | None] = {}
+        # Client ID -> start of the rate limit window and writes within it
+        self._rates: dict[str, tuple[float, int]] = {}
+
+    def change_channel(self, client_id: str, radio_id: object) -> bool:
+        """Queue a channel change.
+
+        Args:
+            client_id: The ID of the client changing channels.
+            radio_id: The ID of the radio station the client is now listening to, as
+                sent by the client.
+
+        Returns:
+            Whether the change was accepted. Changes to unknown radio stations are
+            dropped.
+        """
+        if not isinstance(radio_id, str) or radio_id not in self.valid_ids:
+            logger.warning(f"{client_id} changed to an unknown channel {radio_id!r}")
+            return False
+
+        self._pending[client_id] = radio_id
+        return True
+
+    def _allow_write(self, client_id: str, now: float) -> bool:
+        window_start, count = self._rates.get(client_id, (now, 0))
+        if now - window_start >= CHANNEL_CHANGE_RATE_LIMIT_WINDOW_SECONDS:
+            window_start, count = now, 0
+        if count >= CHANNEL_CHANGE_RATE_LIMIT:
+            if count == CHANNEL_CHANGE_RATE_LIMIT:
+                logger.warning(f"{client_id} is changing channels too fast")
+                self._rates[client_id] = (window_start, count + 1)
+            return False
+        self._rates[client_id] = (window_start, count + 1)
+        return True
+
+    def remove_client(self, client_id: str) -> None:
+        """Queue the removal of a disconnected client.
+
+        Args:
+            client_id: The ID of the client to remove.
+        """
+        self._rates.pop(client_id, None)
+        self._pending[client_id] = None
+
+    async def flush(self, valkey_client: valkey.Valkey) -> None:
+        """Write the pending changes to Valkey.
+
+        Changes from clients over the rate limit stay pending for a later flush.
+        Disconnects are always written.
+
+        Args:
+            valkey_client: The Valkey client to use.
+        """
+        if not self._pending:
+            return
+
+        now = time.monotonic()
+        updates: dict[str, str | None] = {}
+        deferred: dict[str, str | None] = {}
+        for client_id, radio_id in self._pending.items():
+            if radio_id is None or self._allow_write(client_id, now):
+                updates[client_id] = radio_id
+            else:
+                deferred[client_id] = radio_id
+        self._pending = deferred
+        if not updates:
+            return
+
+        try:
+            await listeners.update_clients(valkey_client, self.backend_id, updates)
+        except Exception:
+            # Retry on the next flush, unless there's been newer changes
+            self._pending = {**updates, **self._pending}
+            raise
+        logger.debug(f"Flushed {len(updates)} channel change(s)")
+
+    async def run(self, pool: valkey.ConnectionPool) -> None:
+        """Flush the pending changes periodically.
+
+        Args:
+            pool: The Valkey connection pool to use.
+        """
+        while True:
+            await asyncio.sleep(CHANNEL_CHANGE_FLUSH_INTERVAL_SECONDS)
+            try:
+                async with valkey.Valkey(connection_pool=pool) as client:
+                    await self.flush(client)
+            except valkey.ValkeyError:
+                logger.exception("Error flushing channel changes")
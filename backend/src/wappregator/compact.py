@@ -0,0 +1,94 @@
+from typing import Any
+import datetime
+
+from wapprecommon import listeners, model
+
+# Clients opt in to the compact format by connecting with this in their auth data
+COMPACT_FORMAT_AUTH = {"format": "compact"}
+
+
+class CompactEncoder:
+    """Encodes socket event payloads in a compact format.
+
+    Instead of objects keyed by radio IDs and stream URLs, the compact payloads are
+    lists of [index, value] pairs. Radio indexes refer to the "radios" table sent
+    in the initial state, a list of [radio ID, stream URLs] pairs, and stream indexes
+    to the stream URLs of the radio. Not listening to any radio is index -1.
+
+    - now_playing: [[radio, [title, artist, start as Unix seconds] or null], ...]
+    - stream_status: [[radio, [[stream, 1 or 0], ...]], ...]
+    - listeners: [[radio, count], ...]
+    """
+
+    def __init__(self, radios: list[model.Radio]) -> None:
+        """Initialize the encoder.
+
+        Args:
+            radios: The radios, in the order of their indexes.
+        """
+        self.radio_indexes = {radio.id: i for i, radio in enumerate(radios)}
+        self.radio_indexes[listeners.NOT_LISTENING_ID] = -1
+        self.stream_indexes = {
+            radio.id: {stream.url: i for i, stream in enumerate(radio.streams)}
+            for radio in radios
+        }
+        self.radios_table = [
+            [radio.id, [stream.url for stream in radio.streams]] for radio in radios
+        ]
+
+    @staticmethod
+    def _song(song: dict[str, Any] | None) -> list[Any] | None:
+        if song is None:
+            return None
+        start = datetime.datetime.fromisoformat(song["start"])
+        return [song["title"], song.get("artist"), int(start.timestamp())]
+
+    def _stream_status(self, radio_id: str, status: dict[str, bool]) -> list[Any]:
+        indexes = self.stream_indexes[radio_id]
+        return [[indexes[url], int(ok)] for url, ok in status.items() if url in indexes]
+
+    def encode(self, event: str, data: dict[str, Any]) -> list[Any]:
+        """Encode the payload of an event.
+
+        Radios and streams that aren't in the tables are left out.
+
+        Args:
+            event: The name of the event.
+            data: The payload, keyed by radio IDs.
+
+        Returns:
+            The compact payload.
+
+        Raises:
+            ValueError: If the event isn't one with a compact format.
+        """
+        res: list[Any] = []
+        for radio_id, value in data.items():
+            index = self.radio_indexes.get(radio_id)
+            if index is None:
+                continue
+            if event == "now_playing":
+                res.append([index, self._song(value)])
+            elif event == "stream_status":
+                if radio_id in self.stream_indexes:
+                    res.append([index, self._stream_status(radio_id, value)])
+            elif event == "listeners":
+                res.append([index, value])
+            else:
+                raise ValueError(f"No compact format for {event}")
+        return res
+
+    def encode_initial_state(self, state: dict[str, Any]) -> dict[str, Any]:
+        """Encode the initial state sent on connect.
+
+        Args:
+            state: The initial state, keys are event names and values are their
+                payloads.
+
+        Returns:
+            The compact initial state, including the radios table.
+        """
+        res: dict[str, Any] = {"radios": self.radios_table}
+        for event, data in state.items():
+            res[event] = self.encode(event, data)
+        return res
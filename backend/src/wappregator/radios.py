@@ -0,0 +1,309 @@
+from collections.abc import Callable
+import datetime
+import json
+import logging
+import time
+
+import valkey.asyncio as valkey
+from wapprecommon import constants, internal_model, model, keys
+from wapprecommon import radios as common_radios
+
+from wappregator import utils
+
+RADIOS = [
+    common_radios.RAKKAUDEN,
+    common_radios.TURUN,
+    common_radios.DIODI,
+    common_radios.NORPPA,
+    common_radios.WAPINA,
+    common_radios.RATTO,
+    common_radios.SATEILY,
+    common_radios.JKL,
+]
+
+if constants.INCLUDE_DEV_STATIONS:
+    from wapprecommon import dev_radios
+
+    RADIOS.extend(dev_radios.ALL_DEV_RADIOS)
+
+# Roughly how often the pollers refresh the schedules
+SCHEDULE_MAX_AGE_SECONDS = 60 * 15
+# How long we keep validated schedules in memory if we don't hear of changes
+SCHEDULE_MEMORY_TTL_SECONDS = 60
+
+logger = logging.getLogger(__name__)
+
+
+class FetchingBrokenError(Exception):
+    """Exception for errors that are due to radio fetching being broken on our end."""
+
+    pass
+
+
+class ScheduleCache:
+    """An in-process cache of validated schedules, layered above Valkey.
+
+    Entries are keyed by their Valkey key, which includes both the radio ID and the
+    cache version. They expire after a TTL, or as soon as they're invalidated due to
+    the pollers announcing a schedule change.
+    """
+
+    def __init__(self, ttl_seconds: float) -> None:
+        """Initialize the cache.
+
+        Args:
+            ttl_seconds: How long to keep entries around.
+        """
+        self.ttl_seconds = ttl_seconds
+        self.generation = 0
+        self._entries: dict[str, tuple[float, utils.IndexedSchedule]] = {}
+
+    def get(self, cache_key: str) -> utils.IndexedSchedule | None:
+        """Get a schedule from the cache.
+
+        Args:
+            cache_key: The Valkey key of the schedule.
+
+        Returns:
+            The schedule, or None if it's not cached or has expired.
+        """
+        entry = self._entries.get(cache_key)
+        if entry is None:
+            return None
+        expires_at, schedule = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[cache_key]
+            return None
+        return schedule
+
+    def set(
+        self, cache_key: str, schedule: utils.IndexedSchedule, generation: int
+    ) -> None:
+        """Store a schedule in the cache.
+
+        Args:
+            cache_key: The Valkey key of the schedule.
+            schedule: The validated and indexed schedule.
+            generation: The value of `generation` from before the schedule was read
+                from Valkey. If there's been an invalidation since, the schedule
+                might be outdated and is not stored.
+        """
+        if generation != self.generation:
+            return
+        self._entries[cache_key] = (time.monotonic() + self.ttl_seconds, schedule)
+
+    def invalidate(self, radio_id: str) -> None:
+        """Drop a radio's schedule from the cache.
+
+        Args:
+            radio_id: The ID of the radio whose schedule changed.
+        """
+        self.generation += 1
+        self._entries.pop(keys.get_schedule_key(radio_id), None)
+
+
+schedule_cache = ScheduleCache(SCHEDULE_MEMORY_TTL_SECONDS)
+
+
+def radios() -> dict[str, model.Radio]:
+    """Get the available radios.
+
+    Returns:
+        A dictionary from radio IDs to Radio objects.
+    """
+    return {radio.id: radio for radio in RADIOS}
+
+
+async def _get_all[T](
+    valkey_client: valkey.Valkey,
+    radio_ids: list[str],
+    get_key: Callable[[str], str],
+    parse: Callable[[bytes], T],
+    description: str,
+) -> dict[str, T | None]:
+    """Read and parse a value for each of the given radios in one round trip.
+
+    Args:
+        valkey_client: The Valkey client used for caching.
+        radio_ids: The IDs of the radios whose values to read.
+        get_key: Function from a radio ID to the Valkey key of its value.
+        parse: Function to parse a value read from Valkey.
+        description: What the values are, for logging.
+
+    Returns:
+        Dictionary; keys are radio IDs, values are the parsed values or None for
+        radios that have no value in Valkey. Radios whose values fail to parse are
+        logged and left out.
+    """
+    if not radio_ids:
+        return {}
+
+    values = await valkey_client.mget([get_key(id) for id in radio_ids])
+    res: dict[str, T | None] = {}
+    for id, value in zip(radio_ids, values):
+        if not value:
+            res[id] = None
+            continue
+        try:
+            res[id] = parse(value)
+        except Exception:
+            logger.exception(f"Error parsing a radio {description} for {id}")
+    return res
+
+
+def _parse_schedule(value: bytes) -> utils.IndexedSchedule:
+    return utils.IndexedSchedule(
+        internal_model.CachedSchedule.model_validate_json(value).schedule
+    )
+
+
+async def schedule(
+    valkey_client: valkey.Valkey,
+) -> dict[str, utils.IndexedSchedule]:
+    """Get schedules for all radios.
+
+    The schedules are kept up to date in the cache by the pollers, and kept in
+    memory for a while after reading them, indexed for filtering.
+
+    Args:
+        valkey_client: The Valkey client used for caching.
+
+    Returns:
+        Dictionary; keys are radio IDs, values are their schedules.
+
+    Raises:
+        FetchingBrokenError: If no schedules were found.
+    """
+    found = {}
+    missing_ids = []
+    for radio in RADIOS:
+        cached = schedule_cache.get(keys.get_schedule_key(radio.id))
+        if cached is None:
+            missing_ids.append(radio.id)
+        else:
+            found[radio.id] = cached
+
+    generation = schedule_cache.generation
+    fetched = await _get_all(
+        valkey_client, missing_ids, keys.get_schedule_key, _parse_schedule, "schedule"
+    )
+    for id, result in fetched.items():
+        if result is None:
+            logger.warning(f"No schedule found for {id}")
+            continue
+        schedule_cache.set(keys.get_schedule_key(id), result, generation)
+        found[id] = result
+
+    if not found:
+        raise FetchingBrokenError(
+            "No schedules were found in the cache. See earlier logs for details."
+        )
+
+    # Keep the radios in a consistent order, no matter which ones were cached
+    return {radio.id: found[radio.id] for radio in RADIOS if radio.id in found}
+
+
+async def now_playing(valkey_client: valkey.Valkey) -> dict[str, model.Song | None]:
+    """Get the currently playing song for all relevant radios.
+
+    Args:
+        valkey_client: The Valkey client used for caching.
+
+    Returns:
+        Dictionary; keys are radio IDs, values are their currently playing songs.
+
+    Raises:
+        FetchingBrokenError: If no now playing information could be read.
+    """
+    relevant_ids = [
+        radio.id
+        for radio in RADIOS
+        if radio.current_song_type != model.CurrentSongType.NONE
+    ]
+
+    res = await _get_all(
+        valkey_client,
+        relevant_ids,
+        keys.get_nowplaying_key,
+        model.Song.model_validate_json,
+        "now playing",
+    )
+
+    if not res:
+        raise FetchingBrokenError(
+            "No now playing information fetched successfully. "
+            "See earlier logs for details."
+        )
+    return res
+
+
+async def stream_status(valkey_client: valkey.Valkey) -> dict[str, dict[str, bool]]:
+    """Get the stream status for all relevant radios.
+
+    Args:
+        valkey_client: The Valkey client used for caching.
+
+    Returns:
+        Dictionary; keys are radio IDs, values are dicts mapping stream URLs to their
+        status.
+
+    Raises:
+        FetchingBrokenError: If no stream status information could be read.
+    """
+    relevant_ids = [radio.id for radio in RADIOS if radio.stream_check_enabled]
+
+    statuses = await _get_all(
+        valkey_client,
+        relevant_ids,
+        keys.get_streamstatus_key,
+        json.loads,
+        "stream status",
+    )
+    res = {}
+    for id, result in statuses.items():
+        if result is None:
+            logger.warning(f"No stream status found for {id}")
+            continue
+        res[id] = result
+
+    if not res:
+        raise FetchingBrokenError(
+            "No stream status information fetched successfully. "
+            "See earlier logs for details."
+        )
+
+    return res
+
+
+async def history(
+    valkey_client: valkey.Valkey,
+    radio_id: str,
+    start: datetime.datetime | None,
+    end: datetime.datetime | None,
+    limit: int,
+) -> tuple[list[bytes], datetime.datetime | None]:
+    """Get a page of a radio's play history, newest songs first.
+
+    Args:
+        valkey_client: The Valkey client used for caching.
+        radio_id: The ID of the radio.
+        start: Only include songs that started at or after this.
+        end: Only include songs that started before this.
+        limit: The maximum number of songs to get.
+
+    Returns:
+        The songs as JSON, and the end of the time range for the next page, or None
+        if this is the last page.
+    """
+    entries = await valkey_client.zrevrangebyscore(
+        keys.get_history_key(radio_id),
+        f"({end.timestamp()!r}" if end else "+inf",
+        repr(start.timestamp()) if start else "-inf",
+        start=0,
+        num=limit,
+        withscores=True,
+    )
+    next_end = None
+    if len(entries) == limit:
+        next_end = datetime.datetime.fromtimestamp(entries[-1][1], datetime.UTC)
+    return [song for song, _ in entries], next_end
@@ -3,8 +3,10 @@ from typing import Any
 from collections.abc import AsyncIterator
 import asyncio
 import contextlib
+import json
 import logging
 import os
+import time
 import uuid
 
 import socketio
@@ -12,15 +14,34 @@ import valkey.asyncio as valkey
 from wapprecommon import model, internal_model, keys, listeners
 
 from wappregator import radios
+from wappregator.channel_changes import ChannelChangeBuffer
+from wappregator.compact import COMPACT_FORMAT_AUTH, CompactEncoder
 
 logger = logging.getLogger(__name__)
 
 NOW_PLAYING_EVENT = "now_playing"
 STREAM_STATUS_EVENT = "stream_status"
 LISTENERS_EVENT = "listeners"
+# Combines the above into a single event, sent on connect
+INITIAL_STATE_EVENT = "initial_state"
+# Events whose per-radio values only contain what changed
+PARTIAL_UPDATE_EVENTS = {STREAM_STATUS_EVENT}
+
+# Clients get updates of the radio they're listening to right away, and updates of
+# all radios for the station list in batches
+RADIO_ROOM_PREFIX = "radio:"
+SUMMARY_ROOM = "summary"
+# Clients that opted in to the compact format get the same events from parallel rooms
+COMPACT_ROOM_SUFFIX = ":compact"
+SUMMARY_UPDATE_INTERVAL_SECONDS = 5
 
 HEARBEAT_INTERVAL_SECONDS = 30
-LISTENER_CHECK_INTERVAL_SECONDS = 10
+EVENTS_STREAM_BLOCK_MILLISECONDS = 5000
+EVENTS_STREAM_BATCH_SIZE = 100
+EVENTS_STREAM_RETRY_SECONDS = 1
+# How long we reuse the initial state snapshot read from Valkey, with any events we
+# receive in between applied on top of it
+INITIAL_STATE_MEMORY_TTL_SECONDS = 5
 
 
 def get_backend_id() -> str:
@@ -28,6 +49,30 @@ def get_backend_id() -> str:
     return os.getenv("BACKEND_ID", str(uuid.uuid4()))
 
 
+def get_radio_room(radio_id: str) -> str:
+    """Get the SocketIO room for the listeners of a radio station.
+
+    Args:
+        radio_id: The ID of the radio station.
+
+    Returns:
+        The name of the room.
+    """
+    return f"{RADIO_ROOM_PREFIX}{radio_id}"
+
+
+def get_compact_room(room: str) -> str:
+    """Get the room for the clients using the compact format.
+
+    Args:
+        room: The room for the clients using the default format.
+
+    Returns:
+        The name of the room.
+    """
+    return f"{room}{COMPACT_ROOM_SUFFIX}"
+
+
 def task_exc_handler(task: asyncio.Task) -> None:
     """Handle exceptions of completed asyncio tasks.
 
@@ -46,6 +91,30 @@ def task_exc_handler(task: asyncio.Task) -> None:
         pass
 
 
+def merge_update(
+    event: str, previous: dict[str, Any], data: dict[str, Any]
+) -> dict[str, Any]:
+    """Merge the payload of an event into the previous state of the event.
+
+    Args:
+        event: The name of the event.
+        previous: The previous state, keyed by radio IDs. Not modified.
+        data: The payload of the event, keyed by radio IDs.
+
+    Returns:
+        The new state.
+    """
+    if event not in PARTIAL_UPDATE_EVENTS:
+        return {**previous, **data}
+    return {
+        **previous,
+        **{
+            radio_id: {**previous.get(radio_id, {}), **value}
+            for radio_id, value in data.items()
+        },
+    }
+
+
 def dump_song(song: model.Song | None) -> dict[str, str] | None:
     """Dump a Song object to a JSON-serializable dict.
 
@@ -63,6 +132,108 @@ def dump_song(song: model.Song | None) -> dict[str, str] | None:
     return res
 
 
+class ValkeyManager(socketio.AsyncRedisManager):
+    """A SocketIO client manager that works across backend replicas.
+
+    Emits, room changes and disconnects are passed on to the other replicas through
+    Valkey pub/sub, so they reach the clients of every replica. Uses the backend's
+    Valkey connection pool, which has to be set before the server is used.
+    """
+
+    name = "valkey"
+
+    def __init__(self) -> None:
+        """Initialize the manager."""
+        # The URL is only used to pick the Valkey client library
+        super().__init__(url="valkey://", channel=keys.SOCKETIO_CHANNEL)
+        self.connection_pool: valkey.ConnectionPool | None = None
+
+    def _redis_connect(self) -> None:
+        if self.connection_pool is None:
+            raise RuntimeError("Valkey connection pool not set for the manager")
+        self.redis = valkey.Valkey(connection_pool=self.connection_pool)
+        self.pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        self.connected = True
+
+
+class InitialStateCache:
+    """An in-process copy of the state sent to newly connected clients.
+
+    The pollers maintain a snapshot of the state in Valkey. We read it at most once
+    per TTL, no matter how many clients connect, and keep it up to date in between
+    with the events we broadcast anyway.
+    """
+
+    def __init__(self, ttl_seconds: float) -> None:
+        """Initialize the cache.
+
+        Args:
+            ttl_seconds: How long to reuse a snapshot read from Valkey.
+        """
+        self.ttl_seconds = ttl_seconds
+        self._state: dict[str, Any] | None = None
+        self._expires_at = 0.0
+        self._generation = 0
+        self._lock = asyncio.Lock()
+
+    async def get(self, valkey_client: valkey.Valkey) -> dict[str, Any]:
+        """Get the initial state.
+
+        Args:
+            valkey_client: The Valkey client to use if the state has to be read.
+
+        Returns:
+            The initial state. Keys are event names, values are their payloads.
+        """
+        if self._state is not None and time.monotonic() < self._expires_at:
+            return self._state
+
+        async with self._lock:
+            # Someone else might've read the state while we were waiting
+            if self._state is not None and time.monotonic() < self._expires_at:
+                return self._state
+
+            generation = self._generation
+            state = await self._read(valkey_client)
+            if generation == self._generation:
+                self._state = state
+                self._expires_at = time.monotonic() + self.ttl_seconds
+            return state
+
+    @staticmethod
+    async def _read(valkey_client: valkey.Valkey) -> dict[str, Any]:
+        res = await valkey_client.get(keys.INITIAL_STATE_KEY)
+        if res:
+            return json.loads(res)
+
+        logger.warning("No initial state snapshot found, reading the state directly")
+        currently_playing = await radios.now_playing(valkey_client)
+        return {
+            NOW_PLAYING_EVENT: {k: dump_song(v) for k, v in currently_playing.items()},
+            STREAM_STATUS_EVENT: await radios.stream_status(valkey_client),
+            LISTENERS_EVENT: await listeners.get_listener_counts(
+                valkey_client, [r.id for r in radios.RADIOS]
+            ),
+        }
+
+    def update(self, event: str, data: dict[str, Any]) -> None:
+        """Apply a broadcast event to the cached state.
+
+        Args:
+            event: The name of the event.
+            data: The payload of the event, merged into the previous state.
+        """
+        self._generation += 1
+        if self._state is None:
+            return
+        # Copy instead of mutating, the old state might still be in use
+        updated = merge_update(event, self._state.get(event, {}), data)
+        self._state = {**self._state, event: updated}
+
+
+initial_state_cache = InitialStateCache(INITIAL_STATE_MEMORY_TTL_SECONDS)
+
+
 @contextlib.asynccontextmanager
 async def setup_socketio(
     sio: socketio.AsyncServer, pool: valkey.ConnectionPool
@@ -77,37 +248,59 @@ async def setup_socketio(
         None
     """
     backend_id = get_backend_id()
+    if isinstance(sio.manager, ValkeyManager):
+        sio.manager.connection_pool = pool
+    channel_changes = ChannelChangeBuffer(backend_id, [r.id for r in radios.RADIOS])
+    encoder = CompactEncoder(radios.RADIOS)
+    compact_sids: set[str] = set()
+    # The initial state only changes on events, so we encode it once per change
+    compact_initial_state: tuple[dict[str, Any], dict[str, Any]] | None = None
+
+    async def emit_to_room(event: str, data: dict[str, Any], room: str) -> None:
+        """Emit an event to a room, in each client's format.
+
+        Every backend gets the events from Valkey and relays them to its own
+        clients, so the emits don't need to go through the client manager.
+
+        Args:
+            event: The name of the event.
+            data: The payload of the event.
+            room: The room for the clients using the default format.
+        """
+        await sio.emit(event, data, to=room, ignore_queue=True)
+        await sio.emit(
+            event,
+            encoder.encode(event, data),
+            to=get_compact_room(room),
+            ignore_queue=True,
+        )
 
     @sio.event
-    async def connect(sid: str, environ: dict[str, str], auth: None) -> None:
+    async def connect(sid: str, environ: dict[str, str], auth: Any) -> None:
         """Handle a new socket connection.
 
         Args:
             sid: The session ID of the socket connection.
             environ: Not used.
-            auth: Not used.
+            auth: COMPACT_FORMAT_AUTH to use the compact format, anything else for
+                the default format.
         """
+        nonlocal compact_initial_state
+
         async with valkey.Valkey(connection_pool=pool) as client:
             logger.debug("%s connected to the socket", sid)
-
-            currently_playing = await radios.now_playing(client)
-            await sio.emit(
-                NOW_PLAYING_EVENT,
-                {k: dump_song(v) for k, v in currently_playing.items()},
-                to=sid,
-            )
-
-            stream_status = await radios.stream_status(client)
-            await sio.emit(
-                STREAM_STATUS_EVENT,
-                stream_status,
-                to=sid,
-            )
-
-            listener_counts = await listeners.get_listener_counts(
-                client, [r.id for r in radios.FETCHERS]
-            )
-            await sio.emit(LISTENERS_EVENT, listener_counts, to=sid)
+            state = await initial_state_cache.get(client)
+
+        if auth == COMPACT_FORMAT_AUTH:
+            compact_sids.add(sid)
+            await sio.enter_room(sid, get_compact_room(SUMMARY_ROOM))
+            if compact_initial_state is None or compact_initial_state[0] is not state:
+                compact_initial_state = (state, encoder.encode_initial_state(state))
+            state = compact_initial_state[1]
+        else:
+            await sio.enter_room(sid, SUMMARY_ROOM)
+        # The client is connected to us, no need to involve the other backends
+        await sio.emit(INITIAL_STATE_EVENT, state, to=sid, ignore_queue=True)
 
     @sio.event
     async def disconnect(sid: str, reason: str) -> None:
@@ -117,54 +310,169 @@ async def setup_socketio(
             sid: The session ID of the socket connection.
             reason: The reason for the disconnection.
         """
-        async with valkey.Valkey(connection_pool=pool) as client:
-            logger.debug("%s disconnected from the socket: %s", sid, reason)
-            await listeners.remove_client(client, backend_id, sid)
+        logger.debug("%s disconnected from the socket: %s", sid, reason)
+        compact_sids.discard(sid)
+        channel_changes.remove_client(sid)
 
     @sio.event
     async def change_channel(sid: str, data: str) -> None:
         """Handle a station change event.
 
+        The change is written to Valkey in the next batch, and the client is moved to
+        the room of the new radio station.
+
         Args:
             sid: The session ID of the socket connection.
             data: The ID of the new radio station the client is listening to.
         """
-        async with valkey.Valkey(connection_pool=pool) as client:
-            logger.debug("%s changed channel to %s", sid, data)
-            await listeners.change_channel(client, backend_id, sid, data)
+        logger.debug("%s changed channel to %s", sid, data)
+        if not channel_changes.change_channel(sid, data):
+            return
+
+        new_room = get_radio_room(data)
+        if sid in compact_sids:
+            new_room = get_compact_room(new_room)
+        for room in sio.rooms(sid):
+            if room.startswith(RADIO_ROOM_PREFIX) and room != new_room:
+                await sio.leave_room(sid, room)
+        if data != listeners.NOT_LISTENING_ID:
+            await sio.enter_room(sid, new_room)
+
+    pending_summary: dict[str, dict[str, Any]] = {}
+
+    async def broadcast_radio_update(event: str, radio_id: str, value: Any) -> None:
+        """Broadcast an update of a radio station.
+
+        The radio's listeners get the update right away, everyone else in the next
+        summary.
+
+        Args:
+            event: The name of the event.
+            radio_id: The ID of the radio station.
+            value: The new value for the radio station, or what changed for events in
+                PARTIAL_UPDATE_EVENTS.
+        """
+        data = {radio_id: value}
+        initial_state_cache.update(event, data)
+        pending_summary[event] = merge_update(
+            event, pending_summary.get(event, {}), data
+        )
+        await emit_to_room(event, data, get_radio_room(radio_id))
+
+    async def summary_updates() -> None:
+        """Periodically broadcast the batched updates of all radio stations.
+
+        The radios' listeners get their updates again here, which is harmless.
+        """
+        while True:
+            await asyncio.sleep(SUMMARY_UPDATE_INTERVAL_SECONDS)
+            updates = dict(pending_summary)
+            pending_summary.clear()
+            for event, data in updates.items():
+                await emit_to_room(event, data, SUMMARY_ROOM)
+
+    # The relay handlers below pass the pollers' payloads on as they are, instead of
+    # validating and dumping them again. python-socketio encodes each emit once, no
+    # matter how many clients it goes to.
 
     async def handle_nowplaying_event(msg: dict[str, Any]) -> None:
         """Handle now playing events from Valkey."""
-        event = internal_model.NowPlayingEvent.model_validate_json(msg["data"])
+        event = json.loads(msg["data"])
         logger.info("Broadcasting a now-playing update: %s", event)
-        await sio.emit(
-            NOW_PLAYING_EVENT,
-            {event.radio_id: dump_song(event.now_playing)},
+        await broadcast_radio_update(
+            NOW_PLAYING_EVENT, event["radio_id"], event["now_playing"]
         )
 
+    stream_status_seqs: dict[str, int] = {}
+
     async def handle_streamstatus_event(msg: dict[str, Any]) -> None:
         """Handle stream status events from Valkey."""
-        event = internal_model.StreamStatusEvent.model_validate_json(msg["data"])
+        event = json.loads(msg["data"])
+        radio_id = event["radio_id"]
+        status = event["stream_status"]
+
+        previous_seq = stream_status_seqs.get(radio_id)
+        stream_status_seqs[radio_id] = event["seq"]
+        if (
+            not event["full"]
+            and previous_seq is not None
+            and event["seq"] != previous_seq + 1
+        ):
+            logger.warning("Missed stream status events for %s, resyncing", radio_id)
+            async with valkey.Valkey(connection_pool=pool) as client:
+                res = await client.get(keys.get_streamstatus_key(radio_id))
+            status = json.loads(res) if res else {}
+
         logger.info("Broadcasting a stream status update: %s", event)
-        await sio.emit(
-            STREAM_STATUS_EVENT,
-            {
-                event.radio_id: event.stream_status,
-            },
-        )
+        await broadcast_radio_update(STREAM_STATUS_EVENT, radio_id, status)
 
-    async def listener_updates() -> None:
-        """Periodically check listener counts and broadcast updates."""
-        radio_ids = [radio.id for radio in radios.FETCHERS]
-        previous_counts: dict[str, int] = {}
+    stream_handlers = {
+        keys.NOWPLAYING_CHANNEL: handle_nowplaying_event,
+        keys.STREAMSTATUS_CHANNEL: handle_streamstatus_event,
+    }
+
+    async def read_events_stream() -> None:
+        """Handle now playing and stream status events from the Valkey event stream.
+
+        Unlike with pub/sub, events published while we can't read them, e.g. during a
+        connection blip, aren't lost. We catch up from the last event we've handled.
+        """
+        last_id: bytes | None = None
         while True:
-            async with valkey.Valkey(connection_pool=pool) as client:
-                counts = await listeners.get_listener_counts(client, radio_ids)
-                if counts != previous_counts:
-                    logger.info("Broadcasting a listener count update: %s", counts)
-                    await sio.emit(LISTENERS_EVENT, counts)
-                    previous_counts = counts
-                await asyncio.sleep(LISTENER_CHECK_INTERVAL_SECONDS)
+            try:
+                async with valkey.Valkey(connection_pool=pool) as client:
+                    if last_id is None:
+                        # The initial state has everything up to now
+                        latest = await client.xrevrange(keys.EVENTS_STREAM_KEY, count=1)
+                        last_id = latest[0][0] if latest else b"0-0"
+                    while True:
+                        res = await client.xread(
+                            {keys.EVENTS_STREAM_KEY: last_id},
+                            count=EVENTS_STREAM_BATCH_SIZE,
+                            block=EVENTS_STREAM_BLOCK_MILLISECONDS,
+                        )
+                        for _, entries in res:
+                            for entry_id, fields in entries:
+                                last_id = entry_id
+                                handler = stream_handlers.get(
+                                    fields[b"channel"].decode()
+                                )
+                                if handler is None:
+                                    continue
+                                try:
+                                    await handler({"data": fields[b"data"]})
+                                except Exception:
+                                    logger.exception(
+                                        "Error handling event %s", entry_id
+                                    )
+            except valkey.ValkeyError:
+                logger.exception("Error reading the event stream, retrying")
+                await asyncio.sleep(EVENTS_STREAM_RETRY_SECONDS)
+
+    async def handle_schedule_event(msg: dict[str, Any]) -> None:
+        """Handle schedule change events from Valkey."""
+        event = internal_model.ScheduleEvent.model_validate_json(msg["data"])
+        logger.info("Schedule changed for %s", event.radio_id)
+        radios.schedule_cache.invalidate(event.radio_id)
+
+    listener_counts: dict[str, int] = {}
+
+    async def handle_listeners_event(msg: dict[str, Any]) -> None:
+        """Handle listener count events from Valkey."""
+        counts: dict[str, int] = json.loads(msg["data"])["counts"]
+        # The aggregator resends all counts every now and then, only pass on changes
+        changed = {
+            radio_id: count
+            for radio_id, count in counts.items()
+            if listener_counts.get(radio_id) != count
+        }
+        if not changed:
+            return
+        listener_counts.update(changed)
+        logger.info("Broadcasting a listener count update: %s", changed)
+        initial_state_cache.update(LISTENERS_EVENT, changed)
+        # Everyone is in one of the summary rooms
+        await emit_to_room(LISTENERS_EVENT, changed, SUMMARY_ROOM)
 
     async def heartbeat() -> None:
         """Periodically set heartbeat in Valkey to indicate that we're alive."""
@@ -181,15 +489,16 @@ async def setup_socketio(
     pubsub = pubsub_client.pubsub()
     await pubsub.subscribe(
         **{
-            keys.NOWPLAYING_CHANNEL: handle_nowplaying_event,
-            keys.STREAMSTATUS_CHANNEL: handle_streamstatus_event,
+            keys.SCHEDULE_CHANNEL: handle_schedule_event,
+            keys.LISTENERS_CHANNEL: handle_listeners_event,
         }
     )
 
     bg_tasks = [
         sio.start_background_task(task)
-        for task in [pubsub.run, listener_updates, heartbeat]
+        for task in [pubsub.run, read_events_stream, summary_updates, heartbeat]
     ]
+    bg_tasks.append(sio.start_background_task(channel_changes.run, pool))
     for task in bg_tasks:
         task.add_done_callback(task_exc_handler)
 
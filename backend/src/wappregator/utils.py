@@ -1,13 +1,31 @@
-import logging
+import bisect
+from collections.abc import Callable, Hashable
+import dataclasses
 import datetime
+import functools
+import gzip
+import hashlib
+import logging
+import time
 import zoneinfo
 
+import brotli
+import fastapi
 from wapprecommon import model
 
 logger = logging.getLogger(__name__)
 
 DEFAULT_TZ = zoneinfo.ZoneInfo("Europe/Helsinki")
 
+# Bodies smaller than this aren't worth compressing
+MIN_COMPRESSED_BODY_BYTES = 1024
+BROTLI_QUALITY = 6
+# Supported content codings, in order of preference
+ENCODERS: dict[str, Callable[[bytes], bytes]] = {
+    "br": functools.partial(brotli.compress, quality=BROTLI_QUALITY),
+    "gzip": gzip.compress,
+}
+
 
 def ensure_timezone(dt: datetime.datetime, context: model.Program) -> datetime.datetime:
     """Ensure that a datetime object has timezone information.
@@ -33,6 +51,92 @@ def ensure_timezone(dt: datetime.datetime, context: model.Program) -> datetime.d
     return dt
 
 
+class IndexedSchedule:
+    """A schedule indexed for fast time-window queries.
+
+    The programs are sorted by start time, and their start and end times are made
+    timezone-aware once when the index is built. On top of the sorted start times, we
+    keep the running minimum of end times from each program onwards and the running
+    maximum of end times up to each program. Both are sorted, so queries by either
+    start or end time are binary searches, even though programs may overlap.
+    """
+
+    def __init__(self, programs: list[model.Program]) -> None:
+        """Build the index.
+
+        Args:
+            programs: The schedule to index.
+        """
+        entries = sorted(
+            (
+                (ensure_timezone(p.start, p), ensure_timezone(p.end, p), p)
+                for p in programs
+            ),
+            key=lambda entry: entry[0],
+        )
+        self.programs = [p for _, _, p in entries]
+        self.starts = [start for start, _, _ in entries]
+        self.ends = [end for _, end, _ in entries]
+
+        # min_end_from[i] = min(ends[i:])
+        self.min_end_from = list(self.ends)
+        for i in range(len(self.ends) - 2, -1, -1):
+            self.min_end_from[i] = min(self.min_end_from[i], self.min_end_from[i + 1])
+
+        # max_end_until[i] = max(ends[: i + 1])
+        self.max_end_until = list(self.ends)
+        for i in range(1, len(self.ends)):
+            self.max_end_until[i] = max(
+                self.max_end_until[i], self.max_end_until[i - 1]
+            )
+
+    def __len__(self) -> int:
+        """Get the number of programs in the schedule."""
+        return len(self.programs)
+
+    def ended_before(self, dt: datetime.datetime) -> int:
+        """Get the index after the last program that ended before a point in time.
+
+        Args:
+            dt: The point in time.
+
+        Returns:
+            One past the index of the last program that ended before dt, or 0 if
+            there's no such program.
+        """
+        return bisect.bisect_left(self.min_end_from, dt)
+
+    def started_before(self, dt: datetime.datetime) -> int:
+        """Get the index after the last program that started before a point in time.
+
+        Args:
+            dt: The point in time.
+
+        Returns:
+            One past the index of the last program that started before dt, or 0 if
+            there's no such program.
+        """
+        return bisect.bisect_left(self.starts, dt)
+
+    def running_at(self, dt: datetime.datetime) -> int | None:
+        """Get the index of the last program running at a point in time.
+
+        Args:
+            dt: The point in time.
+
+        Returns:
+            The index of the last program whose start and end times include dt, or
+            None if there's no such program.
+        """
+        for i in range(bisect.bisect_right(self.starts, dt) - 1, -1, -1):
+            if self.max_end_until[i] < dt:
+                # No program before this one runs up to dt either
+                break
+            if self.ends[i] >= dt:
+                return i
+        return None
+
+
 class ScheduleFilter:
     """Filter for a list of Programs.
 
@@ -79,8 +183,8 @@ class ScheduleFilter:
         self.min_previous = min_previous
         self.min_upcoming = min_upcoming
 
-    def __call__(self, schedule: list[model.Program]) -> list[model.Program]:
-        """Filter a list of Programs.
+    def __call__(self, schedule: IndexedSchedule) -> list[model.Program]:
+        """Filter a schedule.
 
         Args:
             schedule: The schedule to filter.
@@ -88,27 +192,28 @@ class ScheduleFilter:
         Returns:
             The filtered list of Programs.
         """
-        now = datetime.datetime.now().astimezone()
+        start_idx, end_idx = self.bounds(schedule)
+        return schedule.programs[start_idx:end_idx]
+
+    def bounds(self, schedule: IndexedSchedule) -> tuple[int, int]:
+        """Get the slice of a schedule that the filter lets through.
+
+        Args:
+            schedule: The schedule to filter.
 
-        start_idx = 0
-        previous_idx = -1
-        current_idx = None
-        end_idx = 0
-        for i, program in enumerate(schedule):
-            program_start = ensure_timezone(program.start, program)
-            program_end = ensure_timezone(program.end, program)
-
-            if program_end < self.start:
-                start_idx = i + 1
-            if program_end < now:
-                previous_idx = i
-            if program_start <= now and now <= program_end:
-                current_idx = i
-            if program_start < self.end:
-                end_idx = i + 1
+        Returns:
+            The start (inclusive) and end (exclusive) indices of the filtered
+            Programs.
+        """
+        start_idx = schedule.ended_before(self.start)
+        end_idx = schedule.started_before(self.end)
 
         if self.min_previous is None and self.min_upcoming is None:
-            return schedule[start_idx:end_idx]
+            return start_idx, end_idx
+
+        now = datetime.datetime.now().astimezone()
+        previous_idx = schedule.ended_before(now) - 1
+        current_idx = schedule.running_at(now)
 
         if self.min_previous is None:
             max_start_idx = previous_idx + 1
@@ -124,4 +229,165 @@ class ScheduleFilter:
                 + 1
             )
 
-        return schedule[min(max_start_idx, start_idx) : max(min_end_idx, end_idx)]
+        return min(max_start_idx, start_idx), max(min_end_idx, end_idx)
+
+
+@dataclasses.dataclass(frozen=True)
+class RenderedResponse:
+    """A pre-rendered response body, along with its ETag and compressed variants.
+
+    The body is only compressed with the encodings that clients actually ask for,
+    the first time one does.
+    """
+
+    body: bytes
+    etag: str
+    media_type: str = "application/json"
+    encoded_bodies: dict[str, bytes] = dataclasses.field(default_factory=dict)
+
+    @classmethod
+    def render(
+        cls, body: bytes, media_type: str = "application/json"
+    ) -> "RenderedResponse":
+        """Pre-render a response body.
+
+        Args:
+            body: The uncompressed response body.
+            media_type: The media type of the body.
+
+        Returns:
+            The rendered response.
+        """
+        etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        return cls(body, etag, media_type)
+
+    def _accepted_encoding(self, accept_encoding: str) -> str | None:
+        if len(self.body) < MIN_COMPRESSED_BODY_BYTES:
+            return None
+        accepted = set()
+        for part in accept_encoding.split(","):
+            coding, *params = part.split(";")
+            quality = 1.0
+            for param in params:
+                name, _, value = param.strip().partition("=")
+                if name == "q":
+                    try:
+                        quality = float(value)
+                    except ValueError:
+                        quality = 0.0
+            if quality > 0:
+                accepted.add(coding.strip().lower())
+        return next((enc for enc in ENCODERS if enc in accepted), None)
+
+    def _encoded_body(self, encoding: str) -> bytes:
+        encoded = self.encoded_bodies.get(encoding)
+        if encoded is None:
+            encoded = ENCODERS[encoding](self.body)
+            self.encoded_bodies[encoding] = encoded
+        return encoded
+
+    def _encoded_etag(self, encoding: str | None) -> str:
+        # Each encoding is a different representation, so it needs its own ETag
+        if encoding is None:
+            return self.etag
+        return f'{self.etag[:-1]}-{encoding}"'
+
+    def _etag_matches(self, if_none_match: str) -> bool:
+        # Any encoding of the same body is fine, as the client can decode all of the
+        # ones it has
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or any(
+            self._encoded_etag(encoding) in tags for encoding in [None, *ENCODERS]
+        )
+
+    def to_response(
+        self, request: fastapi.Request, headers: dict[str, str] | None = None
+    ) -> fastapi.Response:
+        """Build a response fitting the request's conditional and encoding headers.
+
+        Args:
+            request: The request to respond to.
+            headers: Extra headers to include in the response.
+
+        Returns:
+            A 304 response if the client already has this body, otherwise a 200
+            response with the best available encoding of the body.
+        """
+        encoding = self._accepted_encoding(request.headers.get("accept-encoding", ""))
+        response_headers = {
+            **(headers or {}),
+            "ETag": self._encoded_etag(encoding),
+            "Vary": "Accept-Encoding",
+        }
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None and self._etag_matches(if_none_match):
+            return fastapi.Response(status_code=304, headers=response_headers)
+
+        if encoding is None:
+            return fastapi.Response(
+                self.body, media_type=self.media_type, headers=response_headers
+            )
+        response_headers["Content-Encoding"] = encoding
+        return fastapi.Response(
+            self._encoded_body(encoding),
+            media_type=self.media_type,
+            headers=response_headers,
+        )
+
+
+class RenderedResponseCache:
+    """An in-process cache of pre-rendered responses.
+
+    The whole cache is dropped when the generation of the underlying data changes,
+    and single entries expire after a TTL.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int) -> None:
+        """Initialize the cache.
+
+        Args:
+            ttl_seconds: How long to keep entries around.
+            max_entries: How many entries to keep at most. The oldest entries are
+                evicted first.
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._generation: int | None = None
+        self._entries: dict[Hashable, tuple[float, RenderedResponse]] = {}
+
+    def get(self, key: Hashable, generation: int) -> RenderedResponse | None:
+        """Get a rendered response from the cache.
+
+        Args:
+            key: The cache key.
+            generation: The current generation of the underlying data.
+
+        Returns:
+            The rendered response, or None if it's not cached or has expired.
+        """
+        if generation != self._generation:
+            self._entries.clear()
+            self._generation = generation
+            return None
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, rendered = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            return None
+        return rendered
+
+    def set(self, key: Hashable, generation: int, rendered: RenderedResponse) -> None:
+        """Store a rendered response in the cache.
+
+        Args:
+            key: The cache key.
+            generation: The generation of the data the response was rendered from.
+            rendered: The rendered response.
+        """
+        if generation != self._generation:
+            return
+        if len(self._entries) >= self.max_entries:
+            del self._entries[next(iter(self._entries))]
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, rendered)
@@ -1,8 +1,14 @@
+import datetime
+
 import pydantic
 
 from wapprecommon import model
 
 
+def _utc_now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.UTC)
+
+
 class NowPlayingEvent(pydantic.BaseModel):
     """An event emitted from the poller when the currently playing song changes."""
 
@@ -11,7 +17,37 @@ class NowPlayingEvent(pydantic.BaseModel):
 
 
 class StreamStatusEvent(pydantic.BaseModel):
-    """An event emitted from the poller when a stream's status changes."""
+    """An event emitted from the poller when a stream's status changes.
+
+    Only contains the streams whose status changed, unless `full` is set. The
+    sequence number increases by one with each event of a radio, so a gap means that
+    an event was missed and the full status should be read from the cache.
+    """
 
     radio_id: str
     stream_status: dict[str, bool]
+    seq: int
+    full: bool = False
+
+
+class CachedSchedule(pydantic.BaseModel):
+    """A radio's schedule as stored in the cache by the schedule poller."""
+
+    fetched_at: datetime.datetime = pydantic.Field(default_factory=_utc_now)
+    schedule: list[model.Program]
+
+
+class ScheduleEvent(pydantic.BaseModel):
+    """An event emitted from the poller when a radio's schedule changes."""
+
+    radio_id: str
+
+
+class ListenersEvent(pydantic.BaseModel):
+    """An event emitted from the listener count aggregator when counts change.
+
+    Only contains the radios whose counts changed, unless the aggregator is resending
+    all of them.
+    """
+
+    counts: dict[str, int]
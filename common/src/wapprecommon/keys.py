@@ -6,14 +6,36 @@ NOWPLAYING_PREFIX = f"{NOWPLAYING_NAMESPACE}:{CACHE_VERSION}:"
 STREAMSTATUS_NAMESPACE = "streamstatus"
 STREAMSTATUS_PREFIX = f"{STREAMSTATUS_NAMESPACE}:{CACHE_VERSION}:"
 
+SCHEDULE_NAMESPACE = "schedule"
+SCHEDULE_PREFIX = f"{SCHEDULE_NAMESPACE}:{CACHE_VERSION}:"
+
 BACKENDS_NAMESPACE = "backends"
 BACKENDS_PREFIX = f"{BACKENDS_NAMESPACE}:{CACHE_VERSION}:"
 BACKENDS_ONLINE_KEY = f"{BACKENDS_PREFIX}online"
 BACKENDS_CLIENTS_PREFIX = f"{BACKENDS_PREFIX}clients:"
+BACKENDS_LISTENER_COUNTS_KEY = f"{BACKENDS_PREFIX}listener_counts"
+
+SNAPSHOT_NAMESPACE = "snapshot"
+SNAPSHOT_PREFIX = f"{SNAPSHOT_NAMESPACE}:{CACHE_VERSION}:"
+# Everything a client needs on connect, pre-aggregated into a single JSON value
+INITIAL_STATE_KEY = f"{SNAPSHOT_PREFIX}initial_state"
+
+HISTORY_NAMESPACE = "history"
+HISTORY_PREFIX = f"{HISTORY_NAMESPACE}:{CACHE_VERSION}:"
+
+EVENTS_NAMESPACE = "events"
+EVENTS_PREFIX = f"{EVENTS_NAMESPACE}:{CACHE_VERSION}:"
+# A capped log of the now playing and stream status events, so backends can catch
+# up on events they missed. Entries have the event's channel and data as fields.
+EVENTS_STREAM_KEY = f"{EVENTS_PREFIX}stream"
 
 
 NOWPLAYING_CHANNEL = "nowplaying_events"
 STREAMSTATUS_CHANNEL = "streamstatus_events"
+SCHEDULE_CHANNEL = "schedule_events"
+LISTENERS_CHANNEL = "listeners_events"
+# Used by the SocketIO client manager to coordinate between backends
+SOCKETIO_CHANNEL = "socketio_events"
 
 
 def get_nowplaying_key(radio_id: str) -> str:
@@ -40,6 +62,45 @@ def get_streamstatus_key(radio_id: str) -> str:
     return f"{STREAMSTATUS_PREFIX}{radio_id}"
 
 
+def get_streamstatus_seq_key(radio_id: str) -> str:
+    """Get the cache key for the sequence number of a radio's stream status events.
+
+    Args:
+        radio_id: The ID of the radio station.
+
+    Returns:
+        The cache key for the sequence number.
+    """
+    return f"{STREAMSTATUS_PREFIX}seq:{radio_id}"
+
+
+def get_history_key(radio_id: str) -> str:
+    """Get the cache key for the play history of a radio station.
+
+    The history is a sorted set of songs as JSON, scored by their start times as Unix
+    timestamps.
+
+    Args:
+        radio_id: The ID of the radio station.
+
+    Returns:
+        The cache key for the play history of the radio station.
+    """
+    return f"{HISTORY_PREFIX}{radio_id}"
+
+
+def get_schedule_key(radio_id: str) -> str:
+    """Get the cache key for the schedule of a radio station.
+
+    Args:
+        radio_id: The ID of the radio station.
+
+    Returns:
+        The cache key for the schedule of the radio station.
+    """
+    return f"{SCHEDULE_PREFIX}{radio_id}"
+
+
 def get_backend_clients_key(backend_id: str) -> str:
     """Get the cache key for a backend's SocketIO session -> radio channel mapping.
 
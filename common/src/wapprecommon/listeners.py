@@ -1,5 +1,4 @@
 import time
-from collections import Counter
 
 import valkey.asyncio as valkey
 
@@ -7,6 +6,63 @@ from wapprecommon import keys, utils
 
 NOT_LISTENING_ID = "none"
 
+# The listener counts are maintained incrementally, so the client -> channel mappings
+# and the counts have to be updated atomically together.
+
+# KEYS[1]: the backend's clients hash, KEYS[2]: the listener counts hash
+# ARGV: pairs of client ID and new radio ID, an empty radio ID removes the client
+UPDATE_CLIENTS_SCRIPT = """
+for i = 1, #ARGV, 2 do
+    local client_id = ARGV[i]
+    local new_radio_id = ARGV[i + 1]
+    local old_radio_id = redis.call('HGET', KEYS[1], client_id)
+    if old_radio_id ~= new_radio_id then
+        if old_radio_id then
+            redis.call('HINCRBY', KEYS[2], old_radio_id, -1)
+        end
+        if new_radio_id == '' then
+            redis.call('HDEL', KEYS[1], client_id)
+        else
+            redis.call('HSET', KEYS[1], client_id, new_radio_id)
+            redis.call('HINCRBY', KEYS[2], new_radio_id, 1)
+        end
+    end
+end
+return 1
+"""
+# How many clients to update per script call, to not block Valkey for too long
+UPDATE_CLIENTS_BATCH_SIZE = 500
+
+# KEYS[1]: the backend's clients hash, KEYS[2]: the listener counts hash,
+# KEYS[3]: the online backends hash
+# ARGV[1]: backend ID
+CLEANUP_BACKEND_SCRIPT = """
+for _, radio_id in ipairs(redis.call('HVALS', KEYS[1])) do
+    redis.call('HINCRBY', KEYS[2], radio_id, -1)
+end
+redis.call('DEL', KEYS[1])
+redis.call('HDEL', KEYS[3], ARGV[1])
+return 1
+"""
+
+# KEYS[1]: the online backends hash, KEYS[2]: the listener counts hash
+# ARGV[1]: the prefix of the backends' clients hashes
+# The clients hashes can't be listed in KEYS up front, which is fine as long as we
+# don't run a Valkey cluster.
+RECOUNT_SCRIPT = """
+local counts = {}
+for _, backend_id in ipairs(redis.call('HKEYS', KEYS[1])) do
+    for _, radio_id in ipairs(redis.call('HVALS', ARGV[1] .. backend_id)) do
+        counts[radio_id] = (counts[radio_id] or 0) + 1
+    end
+end
+redis.call('DEL', KEYS[2])
+for radio_id, count in pairs(counts) do
+    redis.call('HSET', KEYS[2], radio_id, count)
+end
+return 1
+"""
+
 
 async def backend_heartbeat(valkey: valkey.Valkey, backend_id: str) -> None:
     """Update a backend's heartbeat timestamp.
@@ -55,6 +111,33 @@ async def add_backend(valkey: valkey.Valkey, backend_id: str) -> None:
     await backend_heartbeat(valkey, backend_id)
 
 
+async def update_clients(
+    valkey: valkey.Valkey, backend_id: str, updates: dict[str, str | None]
+) -> None:
+    """Change the radio stations of, or remove, several clients at once.
+
+    Args:
+        valkey: The Valkey client to use for the operation.
+        backend_id: The ID of the backend the clients are connected to.
+        updates: A dictionary mapping client IDs to the IDs of the radio stations
+            they're now listening to, or None for clients to remove. Use
+            NOT_LISTENING_ID for clients that have stopped listening to any station.
+    """
+    script = valkey.register_script(UPDATE_CLIENTS_SCRIPT)
+    items = list(updates.items())
+    for i in range(0, len(items), UPDATE_CLIENTS_BATCH_SIZE):
+        args = []
+        for client_id, radio_id in items[i : i + UPDATE_CLIENTS_BATCH_SIZE]:
+            args += [client_id, radio_id or ""]
+        await script(
+            keys=[
+                keys.get_backend_clients_key(backend_id),
+                keys.BACKENDS_LISTENER_COUNTS_KEY,
+            ],
+            args=args,
+        )
+
+
 async def change_channel(
     valkey: valkey.Valkey, backend_id: str, client_id: str, new_radio_id: str
 ) -> None:
@@ -69,9 +152,7 @@ async def change_channel(
         client_id: The ID of the client changing channels.
         new_radio_id: The ID of the new radio station the client is listening to.
     """
-    await utils.await_valkey_result(
-        valkey.hset(keys.get_backend_clients_key(backend_id), client_id, new_radio_id)
-    )
+    await update_clients(valkey, backend_id, {client_id: new_radio_id})
 
 
 async def remove_client(valkey: valkey.Valkey, backend_id: str, client_id: str) -> None:
@@ -82,9 +163,7 @@ async def remove_client(valkey: valkey.Valkey, backend_id: str, client_id: str)
         backend_id: The ID of the backend the client is connected to.
         client_id: The ID of the client to remove.
     """
-    await utils.await_valkey_result(
-        valkey.hdel(keys.get_backend_clients_key(backend_id), client_id)
-    )
+    await update_clients(valkey, backend_id, {client_id: None})
 
 
 async def cleanup_backend(valkey: valkey.Valkey, backend_id: str) -> None:
@@ -97,10 +176,32 @@ async def cleanup_backend(valkey: valkey.Valkey, backend_id: str) -> None:
         valkey: The Valkey client to use for the operation.
         backend_id: The ID of the backend to clean up.
     """
-    pipe = valkey.pipeline()
-    pipe.delete(keys.get_backend_clients_key(backend_id))
-    pipe.hdel(keys.BACKENDS_ONLINE_KEY, backend_id)
-    await pipe.execute()
+    script = valkey.register_script(CLEANUP_BACKEND_SCRIPT)
+    await script(
+        keys=[
+            keys.get_backend_clients_key(backend_id),
+            keys.BACKENDS_LISTENER_COUNTS_KEY,
+            keys.BACKENDS_ONLINE_KEY,
+        ],
+        args=[backend_id],
+    )
+
+
+async def recount_listeners(valkey: valkey.Valkey) -> None:
+    """Recount the listeners of each radio station from the clients of each backend.
+
+    The counts are normally maintained incrementally, but this corrects any drift and
+    initializes the counts if they're missing. It goes through every connected client
+    of every backend, so it shouldn't be called often.
+
+    Args:
+        valkey: The Valkey client to use for the operation.
+    """
+    script = valkey.register_script(RECOUNT_SCRIPT)
+    await script(
+        keys=[keys.BACKENDS_ONLINE_KEY, keys.BACKENDS_LISTENER_COUNTS_KEY],
+        args=[keys.BACKENDS_CLIENTS_PREFIX],
+    )
 
 
 async def get_listener_counts(
@@ -117,17 +218,17 @@ async def get_listener_counts(
         Has an additional entry with key NOT_LISTENING_ID for clients that aren't
         listening to any station.
     """
-    backends = await utils.await_valkey_result(valkey.hkeys(keys.BACKENDS_ONLINE_KEY))
-    pipe = valkey.pipeline()
-    for backend_id in backends:
-        pipe.hgetall(keys.get_backend_clients_key(utils.handle_valkey_str(backend_id)))
-    backend_clients: list[dict[str, str]] = await pipe.execute()
-
-    counts = Counter(
-        utils.handle_valkey_str(radio_id)
-        for clients in backend_clients
-        for radio_id in clients.values()
+    counts = await utils.await_valkey_result(
+        valkey.hgetall(keys.BACKENDS_LISTENER_COUNTS_KEY)
     )
+    counts_by_id = {
+        utils.handle_valkey_str(radio_id): int(count)
+        for radio_id, count in counts.items()
+    }
     all_ids = [*radio_ids, NOT_LISTENING_ID]
-    all_counts = {radio_id: counts.get(radio_id, 0) for radio_id in all_ids}
+    # A count could briefly go negative if a backend was cleaned up while it was
+    # still alive and its clients then disconnected
+    all_counts = {
+        radio_id: max(counts_by_id.get(radio_id, 0), 0) for radio_id in all_ids
+    }
     return all_counts
@@ -49,6 +49,14 @@ class Song(pydantic.BaseModel):
         return self.artist == other.artist and self.title == other.title
 
 
+class SongHistory(pydantic.BaseModel):
+    """A page of a radio's play history, newest songs first."""
+
+    songs: list[Song]
+    # Pass this as the end of the time range to get the next page, None on the last
+    next_end: datetime.datetime | None = None
+
+
 class Stream(pydantic.BaseModel):
     """Stream data for a radio program."""
 
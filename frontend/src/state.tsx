@@ -327,6 +327,16 @@ export function SocketProvider(props: ParentProps) {
 		: undefined; // undefined = use current location
 	const socket = io(socket_url, socket_options);
 
+	// On connect, the server bundles the state of several events into one, keyed by event
+	// name. Hand each part to the listeners of its own event.
+	socket.on("initial_state", (state: { [event: string]: unknown }) => {
+		for (const [event, data] of Object.entries(state)) {
+			for (const listener of socket.listeners(event)) {
+				listener(data);
+			}
+		}
+	});
+
 	onCleanup(() => {
 		socket.close();
 	});
@@ -362,8 +372,13 @@ export function useStreamStatusState(): Accessor<StreamStatus> {
 	const [streamStatus, setStreamStatus] = createSignal<StreamStatus>({});
 
 	createEffect(() => {
+		// Updates only contain the streams whose status changed
 		const updateStreamStatus = (data: StreamStatus) => {
-			setStreamStatus({ ...streamStatus(), ...data });
+			const merged = { ...streamStatus() };
+			for (const [radioId, statuses] of Object.entries(data)) {
+				merged[radioId] = { ...merged[radioId], ...statuses };
+			}
+			setStreamStatus(merged);
 		};
 		socket.removeAllListeners("stream_status");
 		socket.on("stream_status", updateStreamStatus);
@@ -382,7 +397,7 @@ export function useListenersState(): Accessor<ListenerCounts> {
 
 	createEffect(() => {
 		const updateListenerCounts = (data: ListenerCounts) => {
-			setListenerCounts(data);
+			setListenerCounts({ ...listenerCounts(), ...data });
 		};
 		socket.removeAllListeners("listeners");
 		socket.on("listeners", updateListenerCounts);
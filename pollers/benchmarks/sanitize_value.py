@@ -0,0 +1,138 @@
+"""Benchmark sanitize_value against the BeautifulSoup implementation it replaced.
+
+Run with recorded schedule payloads, e.g.:
+
+    curl -o norppa.json "https://norpparadio.net/api/shows?start=...&end=..."
+    curl -o ratto.ics https://www.rattoradio.fi/ohjelmisto.ics
+    uv run python benchmarks/sanitize_value.py norppa.json ratto.ics
+
+All string values of JSON payloads and the event descriptions of ICS payloads are
+sanitized with both implementations, and any differences in the output are reported.
+"""
+
+from collections.abc import Callable, Iterator
+from typing import Any
+import argparse
+import json
+import pathlib
+import time
+import warnings
+
+import bs4
+import ics
+from bs4 import BeautifulSoup
+
+from wapprepollers.schedules import utils
+
+warnings.filterwarnings("ignore", category=bs4.MarkupResemblesLocatorWarning)
+
+
+def reference_sanitize_value(value: str | None) -> str | None:
+    """Sanitize a value with BeautifulSoup, like sanitize_value used to.
+
+    Args:
+        value: The value to sanitize.
+
+    Returns:
+        The sanitized value.
+    """
+    if value is None:
+        return None
+
+    soup = BeautifulSoup(value, "html.parser")
+
+    for br in soup.find_all("br"):
+        br.replace_with("\n")
+
+    for p in soup.find_all("p"):
+        p.append("\n")
+
+    lines = soup.get_text().splitlines()
+    stripped_lines = [line.strip() for line in lines]
+    res = "\n".join(line for line in stripped_lines if line).strip()
+
+    if res == "":
+        return None
+
+    return res
+
+
+def _json_strings(data: Any) -> Iterator[str]:
+    if isinstance(data, str):
+        yield data
+    elif isinstance(data, dict):
+        for value in data.values():
+            yield from _json_strings(value)
+    elif isinstance(data, list):
+        for value in data:
+            yield from _json_strings(value)
+
+
+def load_values(path: pathlib.Path) -> list[str]:
+    """Load the values to sanitize from a recorded payload.
+
+    Args:
+        path: The path of a JSON or ICS payload.
+
+    Returns:
+        The values to sanitize.
+    """
+    text = path.read_text()
+    if path.suffix == ".ics":
+        # Patched up like in RattoFetcher.parse_response
+        lines = text.splitlines()
+        calendar = ics.Calendar("\n".join([lines[0], "PRODID:-//foobar\n", *lines[1:]]))
+        return [event.description for event in calendar.events if event.description]
+    return list(_json_strings(json.loads(text)))
+
+
+def measure(func: Callable[[str], str | None], values: list[str], rounds: int) -> float:
+    """Measure how long sanitizing the values takes.
+
+    Args:
+        func: The sanitizing function.
+        values: The values to sanitize.
+        rounds: How many times to sanitize all values.
+
+    Returns:
+        The average time of a round in milliseconds.
+    """
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for value in values:
+            func(value)
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def main() -> None:
+    """Run the benchmark."""
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("payloads", nargs="+", type=pathlib.Path)
+    arg_parser.add_argument("--rounds", type=int, default=20)
+    args = arg_parser.parse_args()
+
+    values = [value for path in args.payloads for value in load_values(path)]
+    print(f"{len(values)} values, {sum(map(len, values))} characters")
+
+    mismatches = 0
+    for value in values:
+        expected = reference_sanitize_value(value)
+        actual = utils.sanitize_value.__wrapped__(value)
+        if actual != expected:
+            mismatches += 1
+            print(f"Mismatch for {value!r}:\n  {expected!r}\n  {actual!r}")
+    print(f"{mismatches} mismatches")
+
+    uncached = utils.sanitize_value.__wrapped__
+    results = {
+        "BeautifulSoup": measure(reference_sanitize_value, values, args.rounds),
+        "streaming": measure(uncached, values, args.rounds),
+        # Every refresh after the first one sees the same descriptions
+        "streaming, cached": measure(utils.sanitize_value, values, args.rounds),
+    }
+    for name, ms in results.items():
+        print(f"{name:>20}: {ms:8.2f} ms per refresh")
+
+
+if __name__ == "__main__":
+    main()
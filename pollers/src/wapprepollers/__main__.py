@@ -4,8 +4,11 @@ import logging
 import valkey.asyncio as valkey
 from wapprecommon import constants, radios
 
-from wapprepollers.housekeeping import cleanup_dead_backends
+from wapprepollers import schedules
+from wapprepollers.housekeeping import check_subscribers, cleanup_dead_backends
 from wapprepollers.heartbeat import heartbeat, ready
+from wapprepollers.listener_counts import ListenerCountAggregator
+from wapprepollers.snapshot import InitialStateSnapshot
 from wapprepollers.pollers import diodi, rakkauden, turun, ratto
 from wapprepollers.streams import StreamChecker
 
@@ -20,10 +23,15 @@ STREAMSTATUS_POLLERS = [
     StreamChecker(radio) for radio in radios.ALL_RADIOS if radio.stream_check_enabled
 ]
 
+SCHEDULE_POLLERS = list(schedules.FETCHERS)
+
+ALL_RADIOS = list(radios.ALL_RADIOS)
+
 if constants.INCLUDE_DEV_STATIONS:
     from wapprecommon import dev_radios
 
     from wapprepollers.pollers.somafm import get_somafm_pollers
+    from wapprepollers.schedules.mock import get_mock_fetchers
 
     NOWPLAYING_POLLERS.extend(get_somafm_pollers())
     STREAMSTATUS_POLLERS.extend(
@@ -31,6 +39,8 @@ if constants.INCLUDE_DEV_STATIONS:
         for radio in dev_radios.ALL_DEV_RADIOS
         if radio.stream_check_enabled
     )
+    SCHEDULE_POLLERS.extend(get_mock_fetchers())
+    ALL_RADIOS.extend(dev_radios.ALL_DEV_RADIOS)
 
 logger = logging.getLogger("wapprepollers")
 
@@ -41,7 +51,17 @@ async def main() -> None:
     async with asyncio.TaskGroup() as tg:
         tasks = [poller.loop_wrapper(valkey_pool) for poller in NOWPLAYING_POLLERS]
         tasks += [poller.loop_wrapper(valkey_pool) for poller in STREAMSTATUS_POLLERS]
-        tasks += [cleanup_dead_backends(valkey_pool), heartbeat(), ready(valkey_pool)]
+        tasks += [poller.loop_wrapper(valkey_pool) for poller in SCHEDULE_POLLERS]
+        tasks += [
+            InitialStateSnapshot(ALL_RADIOS).loop_wrapper(valkey_pool),
+            ListenerCountAggregator(ALL_RADIOS).loop_wrapper(valkey_pool),
+        ]
+        tasks += [
+            cleanup_dead_backends(valkey_pool),
+            check_subscribers(valkey_pool),
+            heartbeat(),
+            ready(valkey_pool),
+        ]
         for task in tasks:
             tg.create_task(task)
         logger.info("wapprepollers are go")
@@ -3,10 +3,20 @@ import time
 import logging
 
 import valkey.asyncio as valkey
-from wapprecommon import listeners
+from wapprecommon import keys, listeners
 
 DEAD_BACKEND_CHECK_INTERVAL_SECONDS = 120
 BACKEND_DEAD_THRESHOLD_SECONDS = 60
+# The listener counts are maintained incrementally, this is just to correct any drift
+LISTENER_RECOUNT_INTERVAL_SECONDS = 60 * 30
+SUBSCRIBER_CHECK_INTERVAL_SECONDS = 60 * 5
+# The channels the pollers publish events to
+EVENT_CHANNELS = [
+    keys.NOWPLAYING_CHANNEL,
+    keys.STREAMSTATUS_CHANNEL,
+    keys.SCHEDULE_CHANNEL,
+    keys.LISTENERS_CHANNEL,
+]
 
 logger = logging.getLogger(__name__)
 
@@ -21,10 +31,14 @@ async def cleanup_dead_backends(pool: valkey.ConnectionPool) -> None:
     Usually the backend teardown will handle this, but in case of a truly catastrophic
     failure this might not happen.
 
+    Also recounts the listeners every now and then, starting right away to initialize
+    the counts if needed.
+
     Args:
         pool: The Valkey connection pool to use for the operation.
     """
     async with valkey.Valkey(connection_pool=pool) as client:
+        next_recount = time.monotonic()
         while True:
             hbs = await listeners.get_backend_heartbeats(client)
             now = int(time.time())
@@ -38,4 +52,33 @@ async def cleanup_dead_backends(pool: valkey.ConnectionPool) -> None:
                     "Cleaning up cache entries for dead backend %s", backend_id
                 )
                 await listeners.cleanup_backend(client, backend_id)
+
+            if time.monotonic() >= next_recount:
+                logger.info("Recounting listeners")
+                await listeners.recount_listeners(client)
+                next_recount = time.monotonic() + LISTENER_RECOUNT_INTERVAL_SECONDS
+
             await asyncio.sleep(DEAD_BACKEND_CHECK_INTERVAL_SECONDS)
+
+
+async def check_subscribers(pool: valkey.ConnectionPool) -> None:
+    """Periodically warn about event channels that nobody is subscribed to.
+
+    Events published to such channels are lost, which usually means the backends
+    are down or subscribed to the wrong channels.
+
+    Args:
+        pool: The Valkey connection pool to use for the operation.
+    """
+    async with valkey.Valkey(connection_pool=pool) as client:
+        while True:
+            await asyncio.sleep(SUBSCRIBER_CHECK_INTERVAL_SECONDS)
+            numsub = await client.pubsub_numsub(*EVENT_CHANNELS)
+            unsubscribed = [
+                channel for channel, (_, n) in zip(EVENT_CHANNELS, numsub) if n == 0
+            ]
+            if unsubscribed:
+                logger.warning(
+                    f"No Valkey subscribers on {unsubscribed}, "
+                    f"channels with subscribers: {await client.pubsub_channels()}"
+                )
@@ -0,0 +1,123 @@
+import hashlib
+
+import aiohttp
+
+# Limits for the connection pool shared by all pollers
+HTTP_CONNECTION_LIMIT = 100
+HTTP_CONNECTION_LIMIT_PER_HOST = 8
+HTTP_DNS_CACHE_TTL_SECONDS = 60 * 5
+HTTP_KEEPALIVE_TIMEOUT_SECONDS = 60
+# Default timeouts, individual requests can override these
+HTTP_TIMEOUT = aiohttp.ClientTimeout(total=30, connect=10)
+
+_connector: aiohttp.TCPConnector | None = None
+_session: aiohttp.ClientSession | None = None
+
+
+def get_connector() -> aiohttp.TCPConnector:
+    """Get the process-wide connection pool, creating it on first use.
+
+    Must be called from within the event loop.
+
+    Returns:
+        The connector.
+    """
+    global _connector
+    if _connector is None or _connector.closed:
+        _connector = aiohttp.TCPConnector(
+            limit=HTTP_CONNECTION_LIMIT,
+            limit_per_host=HTTP_CONNECTION_LIMIT_PER_HOST,
+            ttl_dns_cache=HTTP_DNS_CACHE_TTL_SECONDS,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT_SECONDS,
+        )
+    return _connector
+
+
+def get_session() -> aiohttp.ClientSession:
+    """Get the process-wide HTTP session, creating it on first use.
+
+    The session should not be closed by its users. Must be called from within the
+    event loop.
+
+    Returns:
+        The session.
+    """
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            connector=get_connector(), connector_owner=False, timeout=HTTP_TIMEOUT
+        )
+    return _session
+
+
+def new_session() -> aiohttp.ClientSession:
+    """Create a new HTTP session on top of the process-wide connection pool.
+
+    For clients that need a session of their own, e.g. because they keep cookies or
+    close the session themselves. Closing the session doesn't close the pool.
+
+    Returns:
+        The session.
+    """
+    return aiohttp.ClientSession(
+        connector=get_connector(), connector_owner=False, timeout=HTTP_TIMEOUT
+    )
+
+
+class ConditionalRequests:
+    """Remembers previous responses so unchanged ones can be skipped.
+
+    Requests are made conditional with the ETag and Last-Modified validators of the
+    previous response of the same URL. For servers that don't support them, the body
+    is compared to the previous one by its hash.
+    """
+
+    def __init__(self) -> None:
+        """Initialize with no previous responses."""
+        self._validators: dict[str, dict[str, str]] = {}
+        self._digests: dict[str, bytes] = {}
+
+    def headers(self, url: str) -> dict[str, str]:
+        """Get the headers that make a request conditional.
+
+        Args:
+            url: The URL to request.
+
+        Returns:
+            The conditional request headers, empty if there are no validators.
+        """
+        return self._validators.get(url, {})
+
+    async def unchanged(self, url: str, response: aiohttp.ClientResponse) -> bool:
+        """Check whether a successful response is the same as the previous one.
+
+        Reads the body, which aiohttp keeps around for handling the response
+        afterwards. The response is remembered for the next request.
+
+        Args:
+            url: The URL that was requested.
+            response: The response to check.
+
+        Returns:
+            True if the server responded with 304 Not Modified or the body is the
+            same as the previous one.
+        """
+        if response.status == 304:
+            return True
+
+        validators = {}
+        if etag := response.headers.get("ETag"):
+            validators["If-None-Match"] = etag
+        if last_modified := response.headers.get("Last-Modified"):
+            validators["If-Modified-Since"] = last_modified
+        self._validators[url] = validators
+
+        digest = hashlib.blake2b(await response.read(), digest_size=16).digest()
+        unchanged = self._digests.get(url) == digest
+        self._digests[url] = digest
+        return unchanged
+
+    def clear(self) -> None:
+        """Forget all previous responses."""
+        self._validators.clear()
+        self._digests.clear()
@@ -0,0 +1,71 @@
+import asyncio
+import logging
+import time
+
+import valkey.asyncio as valkey
+from wapprecommon import internal_model, keys, listeners, model
+
+from wapprepollers import utils
+
+# Changes within this window are coalesced into a single event
+LISTENER_AGGREGATION_INTERVAL_SECONDS = 1
+# Every now and then, send all counts in case a backend missed an event
+LISTENER_FULL_RESEND_INTERVAL_SECONDS = 60
+
+logger = logging.getLogger(__name__)
+
+
+class ListenerCountAggregator:
+    """Publishes listener count changes for the backends to broadcast."""
+
+    def __init__(self, radios: list[model.Radio]) -> None:
+        """Initialize the aggregator.
+
+        Args:
+            radios: The radios whose listener counts to publish.
+        """
+        self.radio_ids = [radio.id for radio in radios]
+
+    async def loop(self, valkey_client: valkey.Valkey) -> None:
+        """Publish listener count changes in an infinite loop.
+
+        Args:
+            valkey_client: The Valkey client to use.
+        """
+        previous_counts: dict[str, int] = {}
+        next_full_resend = time.monotonic()
+        while True:
+            counts = await listeners.get_listener_counts(valkey_client, self.radio_ids)
+            if time.monotonic() >= next_full_resend:
+                changed = counts
+                next_full_resend = (
+                    time.monotonic() + LISTENER_FULL_RESEND_INTERVAL_SECONDS
+                )
+            else:
+                changed = {
+                    radio_id: count
+                    for radio_id, count in counts.items()
+                    if previous_counts.get(radio_id) != count
+                }
+            previous_counts = counts
+
+            if changed:
+                logger.debug(f"Publishing listener counts: {changed}")
+                await valkey_client.publish(
+                    keys.LISTENERS_CHANNEL,
+                    internal_model.ListenersEvent(counts=changed).model_dump_json(),
+                )
+            await asyncio.sleep(LISTENER_AGGREGATION_INTERVAL_SECONDS)
+
+    async def loop_wrapper(self, connection_pool: valkey.ConnectionPool) -> None:
+        """Publish listener count changes in a loop while handling exceptions.
+
+        Args:
+            connection_pool: The Valkey connection pool to use.
+        """
+        await utils.loop_wrapper(
+            type="Listener count",
+            id="aggregator",
+            loop_func=self.loop,
+            connection_pool=connection_pool,
+        )
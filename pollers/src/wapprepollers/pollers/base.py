@@ -4,12 +4,37 @@ import logging
 
 import aiohttp
 import valkey.asyncio as valkey
+from valkey.asyncio.client import Pipeline
 from wapprecommon import model, internal_model, keys
 
-from wapprepollers import utils
+from wapprepollers import http, scheduling, utils
 
 CACHE_TTL_SECONDS = 60 * 15
+# How many songs to keep in each radio's play history
+HISTORY_MAX_SONGS = 10000
+# Adds a song to the history unless it's the same song as the latest one there.
+# Songs are compared like Song.__eq__ does, ignoring the start time, as pollers see
+# the same song again on every poll, reconnect and restart.
+# KEYS[1]: the history key
+# ARGV[1]: the song as JSON, ARGV[2]: its start timestamp, ARGV[3]: max songs
+ADD_TO_HISTORY_SCRIPT = """
+local latest = redis.call("ZRANGE", KEYS[1], -1, -1)[1]
+if latest then
+    local previous = cjson.decode(latest)
+    local song = cjson.decode(ARGV[1])
+    if previous.artist == song.artist and previous.title == song.title then
+        return 0
+    end
+end
+redis.call("ZADD", KEYS[1], ARGV[2], ARGV[1])
+redis.call("ZREMRANGEBYRANK", KEYS[1], 0, -tonumber(ARGV[3]) - 1)
+return 1
+"""
 HTTP_POLL_INTERVAL_SECONDS = 30
+HTTP_POLL_MAX_UNCHANGED_INTERVAL_SECONDS = 60
+HTTP_POLL_MAX_OFFLINE_INTERVAL_SECONDS = 60 * 30
+HTTP_POLL_BOUNDARY_INTERVAL_SECONDS = 10
+HTTP_POLL_TIMEOUT = aiohttp.ClientTimeout(total=15)
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +59,15 @@ class BasePoller(ABC):
         """
         return keys.get_nowplaying_key(self.id)
 
+    @property
+    def history_key(self) -> str:
+        """Get the cache key for the play history.
+
+        Returns:
+            The cache key for the play history.
+        """
+        return keys.get_history_key(self.id)
+
     async def update_now_playing(
         self,
         valkey_client: valkey.Valkey,
@@ -41,11 +75,26 @@ class BasePoller(ABC):
     ) -> None:
         """Update the currently playing song in the cache & publish an event.
 
+        Songs are also added to the play history, unless the same song is already
+        the latest one there.
+
         Args:
             valkey_client: The Valkey client to use.
             song: The currently playing song.
         """
         logger.info(f"{self.id} is now playing {song}")
+
+        def add_to_history(pipe: Pipeline) -> None:
+            if song is not None:
+                pipe.eval(
+                    ADD_TO_HISTORY_SCRIPT,
+                    1,
+                    self.history_key,
+                    song.model_dump_json(),
+                    str(song.start.timestamp()),
+                    str(HISTORY_MAX_SONGS),
+                )
+
         await utils.store_and_publish(
             valkey_client=valkey_client,
             cache_key=self.cache_key,
@@ -57,6 +106,8 @@ class BasePoller(ABC):
             ).model_dump_json(),
             # A safeguard for clearing this if polling breaks
             cache_ttl_seconds=CACHE_TTL_SECONDS,
+            event_stream=keys.EVENTS_STREAM_KEY,
+            extra_commands=add_to_history,
         )
 
     @abstractmethod
@@ -110,6 +161,13 @@ class HTTPPoller(BasePoller):
         """
         super().__init__(id)
         self.url = url
+        self.scheduler = scheduling.PollScheduler(
+            radio_id=id,
+            interval=HTTP_POLL_INTERVAL_SECONDS,
+            max_unchanged_interval=HTTP_POLL_MAX_UNCHANGED_INTERVAL_SECONDS,
+            max_offline_interval=HTTP_POLL_MAX_OFFLINE_INTERVAL_SECONDS,
+            boundary_interval=HTTP_POLL_BOUNDARY_INTERVAL_SECONDS,
+        )
 
     async def check_response(self, response: aiohttp.ClientResponse) -> bool:
         """Check if the HTTP response is valid.
@@ -147,21 +205,39 @@ class HTTPPoller(BasePoller):
             valkey_client: The Valkey client to use for caching.
         """
         now_playing = None
-        async with aiohttp.ClientSession() as session:
-            while True:
-                try:
-                    logger.info(f"Polling {self.url} for {self.id}")
-                    async with session.get(self.url) as response:
-                        if await self.check_response(response):
-                            result = await self.handle_response(response)
-                            if result != now_playing:
-                                now_playing = result
-                                await self.update_now_playing(valkey_client, result)
-                except (
-                    KeyError,
-                    aiohttp.ClientResponseError,
-                    aiohttp.ContentTypeError,
-                    UnicodeDecodeError,
-                ):
-                    logger.exception(f"Error loading now_playing for {self.id}")
-                await asyncio.sleep(HTTP_POLL_INTERVAL_SECONDS)
+        session = http.get_session()
+        conditional = http.ConditionalRequests()
+        await asyncio.sleep(self.scheduler.initial_delay())
+        while True:
+            # Errors and responses rejected by check_response count as offline
+            result = scheduling.PollResult.OFFLINE
+            retry_after = None
+            try:
+                logger.info(f"Polling {self.url} for {self.id}")
+                async with session.get(
+                    self.url,
+                    headers=conditional.headers(self.url),
+                    timeout=HTTP_POLL_TIMEOUT,
+                ) as response:
+                    retry_after = scheduling.parse_retry_after(
+                        response.headers.get("Retry-After")
+                    )
+                    if await self.check_response(response):
+                        if await conditional.unchanged(self.url, response):
+                            result = scheduling.PollResult.UNCHANGED
+                        else:
+                            song = await self.handle_response(response)
+                            result = scheduling.PollResult.UNCHANGED
+                            if song != now_playing:
+                                now_playing = song
+                                await self.update_now_playing(valkey_client, song)
+                                result = scheduling.PollResult.CHANGED
+            except (
+                KeyError,
+                aiohttp.ClientError,
+                asyncio.TimeoutError,
+                UnicodeDecodeError,
+            ):
+                logger.exception(f"Error loading now_playing for {self.id}")
+            self.scheduler.record(result, retry_after)
+            await self.scheduler.sleep(valkey_client)
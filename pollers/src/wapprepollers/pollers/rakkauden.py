@@ -4,6 +4,7 @@ import socketio
 import valkey.asyncio as valkey
 from wapprecommon import radios, model
 
+from wapprepollers import http
 from wapprepollers.pollers import base
 
 logger = logging.getLogger(__name__)
@@ -23,7 +24,9 @@ class RakkaudenPoller(base.BasePoller):
         Args:
             valkey_client: The Valkey client to use for caching.
         """
-        sio = socketio.AsyncClient()
+        # The client closes its session on disconnect, so it gets one of its own
+        session = http.new_session()
+        sio = socketio.AsyncClient(http_session=session)
 
         @sio.event
         async def np(data: dict[str, str]) -> None:
@@ -41,5 +44,8 @@ class RakkaudenPoller(base.BasePoller):
             )
             await self.update_now_playing(valkey_client, song_model)
 
-        await sio.connect(self.url)
-        await sio.wait()
+        try:
+            await sio.connect(self.url)
+            await sio.wait()
+        finally:
+            await session.close()
@@ -0,0 +1,22 @@
+from wapprepollers.schedules import (
+    diodi,
+    jkl,
+    norppa,
+    rakkauden,
+    ratto,
+    sateily,
+    turun,
+    wapina,
+)
+from wapprepollers.schedules.base import BaseFetcher
+
+FETCHERS: list[BaseFetcher] = [
+    rakkauden.RakkaudenFetcher(),
+    turun.TurunFetcher(),
+    diodi.DiodiFetcher(),
+    norppa.NorppaFetcher(),
+    wapina.WapinaFetcher(),
+    ratto.RattoFetcher(),
+    sateily.SateilyFetcher(),
+    jkl.JklFetcher(),
+]
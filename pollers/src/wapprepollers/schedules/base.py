@@ -0,0 +1,440 @@
+from abc import ABC, abstractmethod
+from typing import Any
+from collections.abc import AsyncIterator
+import asyncio
+import contextlib
+import datetime
+import logging
+
+import aiohttp
+import pydantic
+import valkey.asyncio as valkey
+from valkey import exceptions as valkey_exceptions
+from wapprecommon import model, internal_model, keys
+
+from wapprepollers import http, utils
+
+# How old a cached schedule can get before we fetch it again
+SCHEDULE_REFRESH_INTERVAL_SECONDS = 60 * 15
+SCHEDULE_CHECK_INTERVAL_SECONDS = 60
+SCHEDULE_ERROR_RETRY_SECONDS = 60 * 5
+# A safeguard for clearing schedules if polling breaks for a long time
+CACHE_TTL_SECONDS = 60 * 60 * 6
+REFRESH_LOCK_PREFIX = f"{keys.SCHEDULE_PREFIX}lock:"
+# Schedule pages can be large and slow, but they're not fetched often
+SCHEDULE_FETCH_TIMEOUT = aiohttp.ClientTimeout(total=60, connect=10)
+# Has to outlast the slowest refresh, which can take two fetches (Turun finds the API
+# URL first) and parsing a large page on top of that
+REFRESH_LOCK_TTL_SECONDS = 60 * 5
+
+logger = logging.getLogger(__name__)
+
+adapter = pydantic.TypeAdapter(list[model.Program])
+
+
+class RadioError(Exception):
+    """Exception for errors that are due to the radio webpage misbehaving."""
+
+    pass
+
+
+class NotModifiedError(Exception):
+    """Exception for when the schedule hasn't changed since it was last fetched."""
+
+    pass
+
+
+class BaseFetcher(ABC):
+    """Base class for fetching radio schedules."""
+
+    def __init__(
+        self,
+        radio: model.Radio,
+    ) -> None:
+        """Initialize the fetcher.
+
+        Args:
+            radio: The Radio that this fetcher is for.
+        """
+        self.radio = radio
+        self.conditional = http.ConditionalRequests()
+
+    @property
+    def id(self) -> str:
+        """Get the ID of the radio.
+
+        Returns:
+            The ID of the radio.
+        """
+        return self.radio.id
+
+    @property
+    def url(self) -> str:
+        """Get the URL of the radio.
+
+        Returns:
+            The URL of the radio.
+        """
+        return self.radio.url
+
+    @property
+    def cache_key(self) -> str:
+        """Get the cache key for the schedule of the radio.
+
+        Returns:
+            The cache key for the schedule of the radio.
+        """
+        return keys.get_schedule_key(self.id)
+
+    @property
+    def refresh_lock_key(self) -> str:
+        """Get the key of the lock that guards refreshing the schedule.
+
+        Returns:
+            The key of the refresh lock.
+        """
+        return f"{REFRESH_LOCK_PREFIX}{self.id}"
+
+    @abstractmethod
+    async def get_api_url(self, session: aiohttp.ClientSession) -> str:
+        """Get the URL for the radio's API endpoint.
+
+        Args:
+            session: The aiohttp session to use for possible HTTP requests.
+
+        Returns:
+            The URL for the radio's API endpoint.
+        """
+        ...
+
+    @abstractmethod
+    async def parse_response(self, response: aiohttp.ClientResponse) -> Any:
+        """Parse the response from the radio's API.
+
+        Args:
+            response: The response object from the aiohttp request.
+
+        Returns:
+            The parsed data from the response.
+        """
+        ...
+
+    async def fetch_schedule(self, session: aiohttp.ClientSession) -> Any:
+        """Fetch the schedule from the radio's API.
+
+        Args:
+            session: The aiohttp session to use for the HTTP request.
+
+        Returns:
+            The schedule data (JSON) from the radio's API.
+
+        Raises:
+            RadioError: If there was an error fetching the schedule.
+            NotModifiedError: If the schedule is the same as when it was last fetched.
+        """
+        url = await self.get_api_url(session)
+        async with session.get(
+            url, headers=self.conditional.headers(url), timeout=SCHEDULE_FETCH_TIMEOUT
+        ) as response:
+            try:
+                response.raise_for_status()
+                if await self.conditional.unchanged(url, response):
+                    raise NotModifiedError(
+                        f"Schedule from {self.radio.name} not modified"
+                    )
+                return await self.parse_response(response)
+            except (aiohttp.ClientResponseError, aiohttp.ContentTypeError) as e:
+                raise RadioError(
+                    f"Error fetching schedule from {self.radio.name}"
+                ) from e
+
+    @abstractmethod
+    def parse_schedule(self, data: Any) -> list[model.Program]:
+        """Parse the schedule data into a list of Program objects.
+
+        Args:
+            data: The data from the radio's API (as returned by fetch_schedule).
+
+        Returns:
+            A list of Program objects.
+        """
+        ...
+
+    async def get_schedule(self, session: aiohttp.ClientSession) -> list[model.Program]:
+        """Fetch and parse the schedule from the radio's API.
+
+        Args:
+            session: The aiohttp session to use for HTTP requests.
+
+        Returns:
+            A list of Program objects containing the radio's schedule, sorted by
+            start time.
+
+        Raises:
+            NotModifiedError: If the schedule is the same as when it was last fetched.
+        """
+        data = await self.fetch_schedule(session)
+        return sorted(self.parse_schedule(data), key=lambda x: x.start)
+
+    async def cached_schedule(
+        self, valkey_client: valkey.Valkey
+    ) -> internal_model.CachedSchedule | None:
+        """Get the schedule currently stored in the cache.
+
+        Args:
+            valkey_client: The Valkey client to use for caching.
+
+        Returns:
+            The cached schedule, or None if there is none.
+        """
+        cached = await valkey_client.get(self.cache_key)
+        if cached:
+            return internal_model.CachedSchedule.model_validate_json(cached)
+        return None
+
+    async def update_schedule(
+        self,
+        valkey_client: valkey.Valkey,
+        schedule: list[model.Program],
+        previous: internal_model.CachedSchedule | None,
+    ) -> None:
+        """Update the schedule in the cache & publish an event if it changed.
+
+        Args:
+            valkey_client: The Valkey client to use.
+            schedule: The freshly fetched schedule.
+            previous: The schedule that was in the cache before, if any.
+        """
+        cache_value = internal_model.CachedSchedule(schedule=schedule).model_dump_json()
+        if previous is not None and previous.schedule == schedule:
+            # Just bump the fetch timestamp, no need to bother the backends
+            await valkey_client.set(self.cache_key, cache_value, ex=CACHE_TTL_SECONDS)
+            return
+
+        logger.info(f"Schedule for {self.id} changed ({len(schedule)} programs)")
+        await utils.store_and_publish(
+            valkey_client=valkey_client,
+            cache_key=self.cache_key,
+            cache_value=cache_value,
+            event_channel=keys.SCHEDULE_CHANNEL,
+            event=internal_model.ScheduleEvent(radio_id=self.id).model_dump_json(),
+            cache_ttl_seconds=CACHE_TTL_SECONDS,
+        )
+
+    @contextlib.asynccontextmanager
+    async def _refresh_lock(self, valkey_client: valkey.Valkey) -> AsyncIterator[bool]:
+        """Try to take the lock that guards refreshing the schedule.
+
+        Keeps overlapping poller instances (e.g. during a rollout) from fetching the
+        same schedule twice.
+
+        Args:
+            valkey_client: The Valkey client to use for locking.
+
+        Yields:
+            True if the lock was acquired, False if another worker is holding it.
+        """
+        lock = valkey_client.lock(
+            self.refresh_lock_key,
+            timeout=REFRESH_LOCK_TTL_SECONDS,
+            thread_local=False,
+        )
+        acquired = await lock.acquire(blocking=False)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                try:
+                    await lock.release()
+                except valkey_exceptions.LockError:
+                    logger.warning(f"Refresh lock for {self.id} expired mid-refresh")
+
+    @staticmethod
+    def _needs_refresh(cached: internal_model.CachedSchedule | None) -> bool:
+        if cached is None:
+            return True
+        age = datetime.datetime.now(datetime.UTC) - cached.fetched_at
+        return age > datetime.timedelta(seconds=SCHEDULE_REFRESH_INTERVAL_SECONDS)
+
+    async def refresh(
+        self, session: aiohttp.ClientSession, valkey_client: valkey.Valkey
+    ) -> None:
+        """Refresh the cached schedule if it's missing or too old.
+
+        Args:
+            session: The aiohttp session to use for HTTP requests.
+            valkey_client: The Valkey client to use for caching.
+        """
+        cached = await self.cached_schedule(valkey_client)
+        if not self._needs_refresh(cached):
+            return
+        if cached is None:
+            # Nothing to fall back to if the server says it's not modified
+            self.conditional.clear()
+
+        async with self._refresh_lock(valkey_client) as acquired:
+            if not acquired:
+                return
+            logger.info(f"Refreshing the schedule for {self.id}")
+            try:
+                schedule = await self.get_schedule(session)
+            except NotModifiedError:
+                if cached is None:
+                    raise
+                logger.info(f"Schedule for {self.id} not modified")
+                schedule = cached.schedule
+            await self.update_schedule(valkey_client, schedule, cached)
+
+    async def loop(self, valkey_client: valkey.Valkey) -> None:
+        """Keep the schedule in the cache up to date in an infinite loop.
+
+        Args:
+            valkey_client: The Valkey client to use for caching.
+        """
+        session = http.get_session()
+        while True:
+            delay = SCHEDULE_CHECK_INTERVAL_SECONDS
+            try:
+                await self.refresh(session, valkey_client)
+            except (
+                RadioError,
+                KeyError,
+                ValueError,
+                aiohttp.ClientError,
+                asyncio.TimeoutError,
+            ):
+                logger.exception(f"Error refreshing the schedule for {self.id}")
+                delay = SCHEDULE_ERROR_RETRY_SECONDS
+            await asyncio.sleep(delay)
+
+    async def loop_wrapper(self, connection_pool: valkey.ConnectionPool) -> None:
+        """Keep the schedule up to date in a loop while handling exceptions.
+
+        Args:
+            connection_pool: The Valkey connection pool to use.
+        """
+        await utils.loop_wrapper(
+            type="Schedule",
+            id=self.id,
+            loop_func=self.loop,
+            connection_pool=connection_pool,
+        )
+
+
+class JSONFetcher(BaseFetcher):
+    """Base class for fetchers where the schedule is in JSON."""
+
+    async def parse_response(self, response: aiohttp.ClientResponse) -> Any:
+        """Parse the JSON response from the radio's API.
+
+        Args:
+            response: The response object from the aiohttp request.
+
+        Returns:
+            The parsed data from the response.
+        """
+        return await response.json()
+
+    @abstractmethod
+    def parse_one(self, entry: dict[str, Any]) -> model.Program:
+        """Parse a single entry from the schedule data.
+
+        Args:
+            entry: The entry to parse.
+
+        Returns:
+            A Program object representing the entry.
+        """
+        ...
+
+    def handle_parse_one(self, entry: dict[str, Any]) -> model.Program | None:
+        """Parse a single entry from the schedule data, and handle errors gracefully.
+
+        This is a pre-implemented wrapper for the abstract parse_one to get rid of the
+        need for error handling boilerplate.
+
+        Args:
+            entry: The entry to parse.
+
+        Returns:
+            A Program object representing the entry, or None if a handleable error
+            occurred.
+        """
+        try:
+            return self.parse_one(entry)
+        except KeyError:
+            logger.warning(
+                f"Key error parsing entry {entry} from {self.radio.name}", exc_info=True
+            )
+            return None
+        except ValueError:
+            logger.warning(
+                f"Value error parsing entry {entry} from {self.radio.name}",
+                exc_info=True,
+            )
+            return None
+
+    def parse_schedule(self, data: list[dict[str, Any]]) -> list[model.Program]:
+        """Parse the schedule data into a list of Program objects.
+
+        Args:
+            data: The schedule data to parse.
+
+        Returns:
+            A list of Program objects.
+        """
+        res = [self.handle_parse_one(entry) for entry in data]
+        return [entry for entry in res if entry is not None]
+
+
+class DummyFetcher(BaseFetcher):
+    """A dummy fetcher that always returns an empty schedule."""
+
+    async def get_api_url(self, session: aiohttp.ClientSession) -> str:
+        """Raise a NotImplementedError.
+
+        DummyFetcher does not have an API URL, so this method is not implemented.
+
+        Args:
+            session: Not used.
+
+        Returns:
+            Never.
+
+        Raises:
+            NotImplementedError: Always.
+        """
+        raise NotImplementedError("DummyFetcher does not have an API URL")
+
+    async def parse_response(self, response: aiohttp.ClientResponse) -> None:
+        """Do nothing.
+
+        Args:
+            response: Not used.
+
+        Returns:
+            None.
+        """
+        return None
+
+    def parse_schedule(self, data: None) -> list[model.Program]:
+        """Return an empty schedule.
+
+        Args:
+            data: Not used.
+
+        Returns:
+            An empty list.
+        """
+        return []
+
+    async def fetch_schedule(self, session: aiohttp.ClientSession) -> None:
+        """Do nothing.
+
+        Args:
+            session: Not used.
+
+        Returns:
+            None.
+        """
+        return None
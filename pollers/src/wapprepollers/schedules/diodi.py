@@ -4,7 +4,7 @@ import logging
 import aiohttp
 from wapprecommon import model, radios
 
-from wappregator.radios import base, utils
+from wapprepollers.schedules import base, utils
 
 
 logger = logging.getLogger(__name__)
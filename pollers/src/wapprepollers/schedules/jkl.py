@@ -1,3 +1,4 @@
+import asyncio
 import datetime
 import re
 import logging
@@ -7,15 +8,133 @@ import aiohttp
 from bs4 import BeautifulSoup, element
 from wapprecommon import model, radios
 
-from wappregator.radios import base
+from wapprepollers.schedules import base
 
 DATE_RE = re.compile(r"^\d{1,2}\.\d{1,2}\.(\d{4})?$")
 TIME_RE = re.compile(r"^\d{1,2}(([:.])?\d{2})?$")
 SPLIT_RE = re.compile(r"[\u2013\u2014-]")  # Matches (e[nm])?dash
+# <div>s whose class list includes "container"
+CONTAINER_DIV_RE = re.compile(
+    r"""<div\b[^>]*\bclass\s*=\s*(["'])(?:[^"']*\s)?container(?:\s[^"']*)?\1""",
+    re.IGNORECASE,
+)
+# Tags, along with the comments and the script and style bodies that aren't parsed
+# as HTML, so that tags in them aren't counted
+HTML_TOKEN_RE = re.compile(
+    r"""<!--.*?-->"""
+    r"""|<(script|style)\b(?:[^>"']|"[^"]*"|'[^']*')*>.*?</\1\s*>"""
+    r"""|<(/?)([a-z][^\s/>]*)(?:[^>"']|"[^"]*"|'[^']*')*>""",
+    re.IGNORECASE | re.DOTALL,
+)
 
 logger = logging.getLogger(__name__)
 
 
+def get_schedule_title() -> str:
+    """Get the title of this year's schedule on the JKL website.
+
+    Returns:
+        The title.
+    """
+    return f"Ohjelmakartta {datetime.datetime.now().year}"
+
+
+def find_schedule_container(data: BeautifulSoup) -> element.Tag | None:
+    """Find the .container element with this year's schedule.
+
+    Args:
+        data: The parsed HTML.
+
+    Returns:
+        The container, or None if there's no schedule for this year.
+
+    Raises:
+        RadioError: If the schedule title isn't in a container.
+    """
+    # There are multiple .container elements, so find the one containing
+    # <h3>Ohjelmakartta 2025</h3>
+    title_content = get_schedule_title()
+    headers = data.find_all("h3")
+    schedule_title = next(
+        (header for header in headers if header.string == title_content), None
+    )
+    if schedule_title is None:
+        return None
+
+    schedule_container = schedule_title.find_parent("div", class_="container")
+    if schedule_container is None:
+        raise base.RadioError("Could not find schedule container")
+    return schedule_container
+
+
+def extract_schedule_container(html: str) -> str | None:
+    """Cut the .container element with this year's schedule out of the page.
+
+    This is a quick scan of the raw HTML's tags, so that only the container needs to
+    be parsed. Like in the parser, tags in comments, scripts and styles don't count.
+    The result should be checked with find_schedule_container.
+
+    Args:
+        html: The HTML of the whole page.
+
+    Returns:
+        The HTML of the container, or None if it couldn't be found.
+    """
+    title_re = re.compile(
+        r"<h3\b[^>]*>(?:<[^/>][^>]*>)*" + re.escape(get_schedule_title()) + "<"
+    )
+    # Start positions of the open <div>s, and whether they are .containers
+    open_divs: list[tuple[int, bool]] = []
+    # How many <div>s were open around the innermost container around the title
+    target_depth: int | None = None
+    for token in HTML_TOKEN_RE.finditer(html):
+        name = (token.group(3) or "").lower()
+        closing = token.group(2) == "/"
+        if name == "div" and not closing:
+            is_container = CONTAINER_DIV_RE.match(html, token.start()) is not None
+            open_divs.append((token.start(), is_container))
+        elif name == "div" and open_divs:
+            start, _ = open_divs.pop()
+            if len(open_divs) == target_depth:
+                return html[start : token.end()]
+        elif name == "h3" and not closing and target_depth is None:
+            if title_re.match(html, token.start()) is None:
+                continue
+            containers = [i for i, (_, c) in enumerate(open_divs) if c]
+            if not containers:
+                return None
+            target_depth = containers[-1]
+
+    if target_depth is None:
+        return None
+    # Never closed, so it contains the rest of the page
+    return html[open_divs[target_depth][0] :]
+
+
+def parse_html(html: str) -> BeautifulSoup:
+    """Parse the schedule part of the JKL website.
+
+    Only the container with the schedule is parsed if it can be found, and the whole
+    page otherwise.
+
+    Args:
+        html: The HTML of the whole page.
+
+    Returns:
+        The parsed HTML.
+    """
+    fragment = extract_schedule_container(html)
+    if fragment is not None:
+        data = BeautifulSoup(fragment, "html.parser")
+        try:
+            if find_schedule_container(data) is not None:
+                return data
+        except base.RadioError:
+            pass
+        logger.warning("Schedule container extraction failed, parsing the whole page")
+    return BeautifulSoup(html, "html.parser")
+
+
 def parse_time(time_str: str) -> datetime.time:
     """Parse a time string.
 
@@ -70,7 +189,8 @@ class JklFetcher(base.BaseFetcher):
             A BeautifulSoup object representing the parsed HTML.
         """
         # JKL doesn't have a proper API; we just parse stuff from the website.
-        return BeautifulSoup(await response.text(), "html.parser")
+        # It's a big page, so keep the parsing from blocking the other pollers.
+        return await asyncio.to_thread(parse_html, await response.text())
 
     def parse_schedule(self, data: BeautifulSoup) -> list[model.Program]:
         """Parse the schedule data from the response.
@@ -81,22 +201,11 @@ class JklFetcher(base.BaseFetcher):
         Returns:
             A list of Program objects representing the schedule.
         """
-        # Find the .container element, containing <h3>Ohjelmakartta 2025</h3>
-        # There are multiple .container elements, so find the right one
-        # Every day has a <h4> title (Tiistai 22.4.2025) followed by a <p>, containing
-        # the programs of the day separated by <br>
-
-        title_content = f"Ohjelmakartta {datetime.datetime.now().year}"
-        headers = data.find_all("h3")
-        schedule_title = next(
-            (header for header in headers if header.string == title_content), None
-        )
-        if schedule_title is None:
-            return []
-
-        schedule_container = schedule_title.find_parent("div", class_="container")
+        # Every day in the .container element has a <h4> title (Tiistai 22.4.2025)
+        # followed by a <p>, containing the programs of the day separated by <br>
+        schedule_container = find_schedule_container(data)
         if schedule_container is None:
-            raise base.RadioError("Could not find schedule container")
+            return []
         schedule = []
 
         # Suomi Finland summer time is UTC+3
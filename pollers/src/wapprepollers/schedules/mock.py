@@ -5,10 +5,9 @@ import hashlib
 import struct
 
 import aiohttp
-import valkey.asyncio as valkey
 from wapprecommon import dev_radios, model
 
-from wappregator.radios import base
+from wapprepollers.schedules import base
 
 PROGRAM_TITLES = [
     "Morning Show",
@@ -154,16 +153,11 @@ class MockFetcher(base.BaseFetcher):
         """Pass through - data is already a list of Programs."""
         return data
 
-    async def __call__(
-        self,
-        session: aiohttp.ClientSession,
-        valkey_client: valkey.Valkey,
-    ) -> list[model.Program]:
-        """Generate mock schedule directly, bypassing cache.
+    async def get_schedule(self, session: aiohttp.ClientSession) -> list[model.Program]:
+        """Generate mock schedule directly, bypassing the network.
 
         Args:
             session: Not used.
-            valkey_client: Not used.
 
         Returns:
             Generated mock programs.
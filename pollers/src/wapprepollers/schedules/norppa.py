@@ -5,7 +5,7 @@ from urllib.parse import quote
 import aiohttp
 from wapprecommon import model, radios
 
-from wappregator.radios import base, utils
+from wapprepollers.schedules import base, utils
 
 WINDOW_DAYS = 7
 
@@ -4,7 +4,7 @@ import aiohttp
 import ics
 from wapprecommon import model, radios
 
-from wappregator.radios import base, utils
+from wapprepollers.schedules import base, utils
 
 HOST_RE = re.compile(r"^Toimittajat?:\s*(.+)$", re.MULTILINE)
 PRODUCER_RE = re.compile(r"^Tuottajat?:\s*(.+)$", re.MULTILINE)
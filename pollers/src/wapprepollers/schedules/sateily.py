@@ -2,10 +2,9 @@ from importlib import resources
 from typing import Any
 
 import aiohttp
-import valkey.asyncio as valkey
 from wapprecommon import model, radios
 
-from wappregator.radios import base
+from wapprepollers.schedules import base
 
 
 class SateilyFetcher(base.BaseFetcher):
@@ -38,12 +37,10 @@ class SateilyFetcher(base.BaseFetcher):
         """
         return base.adapter.validate_json(data)
 
-    async def __call__(
-        self, session: aiohttp.ClientSession, valkey_client: valkey.Valkey
-    ) -> list[model.Program]:
+    async def get_schedule(self, session: aiohttp.ClientSession) -> list[model.Program]:
         """Return the schedule directly from the bundled JSON file.
 
-        The schedule is static, so there's no need to hit the network or cache.
+        The schedule is static, so there's no need to hit the network.
         """
         raw = resources.files(__package__).joinpath("sateily.json").read_bytes()
         return sorted(self.parse_schedule(raw), key=lambda x: x.start)
@@ -6,7 +6,7 @@ import logging
 import aiohttp
 from wapprecommon import model, radios
 
-from wappregator.radios import base
+from wapprepollers.schedules import base
 
 BUILD_ID_RE = re.compile(r"\"buildId\":\"([\w-]+)\"")
 
@@ -37,7 +37,9 @@ class TurunFetcher(base.JSONFetcher):
             RadioError: If there was an error fetching the index or if the
                 build ID could not be found from it.
         """
-        async with session.get(self.url) as response:
+        async with session.get(
+            self.url, timeout=base.SCHEDULE_FETCH_TIMEOUT
+        ) as response:
             try:
                 response.raise_for_status()
                 html = await response.text()
@@ -0,0 +1,166 @@
+from html import parser
+import functools
+
+from bs4.builder import HTMLTreeBuilder
+from bs4.dammit import EntitySubstitution, UnicodeDammit
+
+# How many distinct values to remember, the descriptions rarely change between
+# schedule refreshes
+SANITIZE_CACHE_SIZE = 4096
+
+_EMPTY_ELEMENT_TAGS = set(HTMLTreeBuilder.DEFAULT_EMPTY_ELEMENT_TAGS or ())
+# Strings inside these tags aren't text, e.g. scripts and styles
+_STRING_CONTAINER_TAGS = set(HTMLTreeBuilder.DEFAULT_STRING_CONTAINERS)
+_PRESERVE_WHITESPACE_TAGS = set(HTMLTreeBuilder.DEFAULT_PRESERVE_WHITESPACE_TAGS)
+_ASCII_SPACES = set(" \n\t\x0c\r")
+
+
+class _TextExtractor(parser.HTMLParser):
+    """Extracts text from HTML like BeautifulSoup with html.parser would.
+
+    Instead of building a tree, this tracks the open tags and emits text as it goes.
+    The result is the same as with the tree: <br> tags and the ends of <p> tags turn
+    into newlines, and text is handled like BeautifulSoup's get_text() would, down to
+    its quirks.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=False)
+        self.parts: list[str] = []
+        self._data: list[str] = []
+        self._open: list[str] = []
+        self._already_closed: list[str] = []
+        # Counts of the open tags that change how the text is handled
+        self._open_br = 0
+        self._open_containers = 0
+        self._open_preserving = 0
+
+    def _flush(self, cdata: bool = False) -> None:
+        if not self._data:
+            return
+        data = "".join(self._data)
+        self._data.clear()
+        if not self._open_preserving and all(c in _ASCII_SPACES for c in data):
+            data = "\n" if "\n" in data else " "
+        # Everything inside a <br> is replaced along with it
+        if not self._open_br and (cdata or not self._open_containers):
+            self.parts.append(data)
+
+    def _push(self, tag: str) -> None:
+        self._open.append(tag)
+        if tag == "br":
+            if not self._open_br:
+                self.parts.append("\n")
+            self._open_br += 1
+        self._open_containers += tag in _STRING_CONTAINER_TAGS
+        self._open_preserving += tag in _PRESERVE_WHITESPACE_TAGS
+
+    def _pop(self) -> str:
+        tag = self._open.pop()
+        if tag == "br":
+            self._open_br -= 1
+        elif tag == "p" and not self._open_br:
+            self.parts.append("\n")
+        self._open_containers -= tag in _STRING_CONTAINER_TAGS
+        self._open_preserving -= tag in _PRESERVE_WHITESPACE_TAGS
+        return tag
+
+    def _close(self, tag: str) -> None:
+        self._flush()
+        if tag in self._open:
+            while self._pop() != tag:
+                pass
+
+    def handle_starttag(
+        self,
+        tag: str,
+        attrs: list[tuple[str, str | None]],
+        handle_empty_element: bool = True,
+    ) -> None:
+        self._flush()
+        self._push(tag)
+        if handle_empty_element and tag in _EMPTY_ELEMENT_TAGS:
+            self._close(tag)
+            # A later closing tag for this is redundant
+            self._already_closed.append(tag)
+
+    def handle_startendtag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        self.handle_starttag(tag, attrs, handle_empty_element=False)
+        self.handle_endtag(tag)
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in self._already_closed:
+            self._already_closed.remove(tag)
+        else:
+            self._close(tag)
+
+    def handle_data(self, data: str) -> None:
+        self._data.append(data)
+
+    def handle_charref(self, name: str) -> None:
+        if name.startswith("x"):
+            codepoint = int(name.lstrip("x"), 16)
+        elif name.startswith("X"):
+            codepoint = int(name.lstrip("X"), 16)
+        else:
+            codepoint = int(name)
+        self.handle_data(UnicodeDammit.numeric_character_reference(codepoint)[0])
+
+    def handle_entityref(self, name: str) -> None:
+        character = EntitySubstitution.HTML_ENTITY_TO_CHARACTER.get(name)
+        self.handle_data(character if character is not None else f"&{name}")
+
+    def handle_comment(self, data: str) -> None:
+        self._flush()
+
+    def handle_decl(self, decl: str) -> None:
+        self._flush()
+
+    def handle_pi(self, data: str) -> None:
+        self._flush()
+
+    def unknown_decl(self, data: str) -> None:
+        self._flush()
+        if data.upper().startswith("CDATA["):
+            self._data.append(data[len("CDATA[") :])
+            self._flush(cdata=True)
+
+    def close(self) -> None:
+        super().close()
+        self._flush()
+        while self._open:
+            self._pop()
+
+
+@functools.lru_cache(maxsize=SANITIZE_CACHE_SIZE)
+def sanitize_value(value: str | None) -> str | None:
+    """Sanitize a value.
+
+    Turns <p> and <br> into appropriate newlines,
+    strips HTML tags and turns empty strings into None.
+
+    Args:
+        value: The value to sanitize.
+
+    Returns:
+        The sanitized value.
+    """
+    if value is None:
+        return None
+
+    if "<" in value or "&" in value:
+        extractor = _TextExtractor()
+        extractor.feed(value)
+        extractor.close()
+        text = "".join(extractor.parts)
+    else:
+        text = value
+
+    lines = text.splitlines()
+    stripped_lines = [line.strip() for line in lines]
+    res = "\n".join(line for line in stripped_lines if line).strip()
+
+    if res == "":
+        return None
+
+    return res
@@ -3,7 +3,7 @@ import datetime
 import aiohttp
 from wapprecommon import model, radios
 
-from wappregator.radios import base
+from wapprepollers.schedules import base
 
 
 class WapinaFetcher(base.JSONFetcher):
@@ -0,0 +1,200 @@
+import asyncio
+import bisect
+import datetime
+import email.utils
+import enum
+import logging
+import random
+import time
+import zoneinfo
+
+import pydantic
+import valkey.asyncio as valkey
+from wapprecommon import internal_model, keys
+
+# Each delay is randomized by this fraction so the pollers don't fire in lockstep
+POLL_JITTER = 0.1
+UNCHANGED_BACKOFF_FACTOR = 1.25
+OFFLINE_BACKOFF_FACTOR = 2
+# Poll more often this close to a program starting or ending
+PROGRAM_BOUNDARY_WINDOW_SECONDS = 60 * 2
+PROGRAM_BOUNDARY_RELOAD_INTERVAL_SECONDS = 60 * 5
+# Don't let a misbehaving server put us to sleep for longer than this
+RETRY_AFTER_MAX_SECONDS = 60 * 60
+# Schedules without timezone information are in Helsinki time
+DEFAULT_TZ = zoneinfo.ZoneInfo("Europe/Helsinki")
+
+logger = logging.getLogger(__name__)
+
+
+class PollResult(enum.Enum):
+    """The outcome of a single poll."""
+
+    CHANGED = enum.auto()
+    UNCHANGED = enum.auto()
+    OFFLINE = enum.auto()
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Parse the value of a Retry-After header.
+
+    Args:
+        value: The value of the header, if the response had one.
+
+    Returns:
+        How many seconds to wait before the next request, or None if the value is
+        missing or invalid.
+    """
+    if value is None:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        seconds = float(value)
+    else:
+        try:
+            retry_at = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=datetime.UTC)
+        seconds = (retry_at - datetime.datetime.now(datetime.UTC)).total_seconds()
+    return min(max(seconds, 0), RETRY_AFTER_MAX_SECONDS)
+
+
+class PollScheduler:
+    """Decides how long a poller waits between polls.
+
+    The interval starts at the base interval and resets to it whenever a poll sees a
+    change. Polls that see nothing new back off gently up to max_unchanged_interval,
+    and polls that find the source offline back off exponentially up to
+    max_offline_interval. Close to a program starting or ending in the radio's cached
+    schedule, the interval is capped to boundary_interval, as that's when the radios
+    tend to go on and off the air. Retry-After from the source always wins.
+    """
+
+    def __init__(
+        self,
+        radio_id: str,
+        interval: float,
+        max_unchanged_interval: float,
+        max_offline_interval: float,
+        boundary_interval: float,
+    ) -> None:
+        """Initialize the scheduler.
+
+        Args:
+            radio_id: The ID of the radio whose schedule to follow.
+            interval: The base interval between polls, in seconds.
+            max_unchanged_interval: The longest interval while the source is online
+                but unchanged, in seconds.
+            max_offline_interval: The longest interval while the source is offline,
+                in seconds.
+            boundary_interval: The longest interval close to program boundaries, in
+                seconds.
+        """
+        self.radio_id = radio_id
+        self.interval = interval
+        self.max_unchanged_interval = max_unchanged_interval
+        self.max_offline_interval = max_offline_interval
+        self.boundary_interval = boundary_interval
+        self.current_interval = interval
+        self._retry_after: float | None = None
+        # Program start and end times as Unix timestamps, sorted
+        self._boundaries: list[float] = []
+        self._boundaries_loaded_at: float | None = None
+
+    def initial_delay(self) -> float:
+        """Get a random delay before the first poll.
+
+        Returns:
+            The delay in seconds.
+        """
+        return random.uniform(0, self.interval)
+
+    def record(self, result: PollResult, retry_after: float | None = None) -> None:
+        """Record the outcome of a poll.
+
+        Args:
+            result: The outcome of the poll.
+            retry_after: How long the source asked us to wait, in seconds, if it did.
+        """
+        if result == PollResult.CHANGED:
+            self.current_interval = self.interval
+        elif result == PollResult.UNCHANGED:
+            self.current_interval = min(
+                self.current_interval * UNCHANGED_BACKOFF_FACTOR,
+                self.max_unchanged_interval,
+            )
+        else:
+            self.current_interval = min(
+                self.current_interval * OFFLINE_BACKOFF_FACTOR,
+                self.max_offline_interval,
+            )
+        self._retry_after = retry_after
+
+    async def _load_boundaries(self, valkey_client: valkey.Valkey) -> None:
+        cached = await valkey_client.get(keys.get_schedule_key(self.radio_id))
+        self._boundaries_loaded_at = time.monotonic()
+        if not cached:
+            self._boundaries = []
+            return
+        try:
+            schedule = internal_model.CachedSchedule.model_validate_json(cached)
+        except pydantic.ValidationError:
+            logger.warning(f"Invalid cached schedule for {self.radio_id}")
+            self._boundaries = []
+            return
+        self._boundaries = sorted(
+            (dt if dt.tzinfo else dt.replace(tzinfo=DEFAULT_TZ)).timestamp()
+            for program in schedule.schedule
+            for dt in (program.start, program.end)
+        )
+
+    async def near_boundary(self, valkey_client: valkey.Valkey) -> bool:
+        """Check whether a program is about to start or end, or just did.
+
+        Args:
+            valkey_client: The Valkey client to read the cached schedule with.
+
+        Returns:
+            True if a program boundary is within the boundary window from now.
+        """
+        if (
+            self._boundaries_loaded_at is None
+            or time.monotonic() - self._boundaries_loaded_at
+            > PROGRAM_BOUNDARY_RELOAD_INTERVAL_SECONDS
+        ):
+            await self._load_boundaries(valkey_client)
+
+        now = time.time()
+        i = bisect.bisect_left(self._boundaries, now - PROGRAM_BOUNDARY_WINDOW_SECONDS)
+        return (
+            i < len(self._boundaries)
+            and self._boundaries[i] <= now + PROGRAM_BOUNDARY_WINDOW_SECONDS
+        )
+
+    async def next_delay(self, valkey_client: valkey.Valkey) -> float:
+        """Get the delay before the next poll.
+
+        Args:
+            valkey_client: The Valkey client to read the cached schedule with.
+
+        Returns:
+            The delay in seconds.
+        """
+        delay = self.current_interval
+        if delay > self.boundary_interval and await self.near_boundary(valkey_client):
+            delay = self.boundary_interval
+        delay *= random.uniform(1 - POLL_JITTER, 1 + POLL_JITTER)
+        if self._retry_after is not None and self._retry_after > delay:
+            logger.info(f"{self.radio_id} asked us to retry after {self._retry_after}s")
+            delay = self._retry_after
+        return delay
+
+    async def sleep(self, valkey_client: valkey.Valkey) -> None:
+        """Sleep until the next poll.
+
+        Args:
+            valkey_client: The Valkey client to read the cached schedule with.
+        """
+        await asyncio.sleep(await self.next_delay(valkey_client))
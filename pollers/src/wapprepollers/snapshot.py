@@ -0,0 +1,125 @@
+from typing import Any
+import json
+import logging
+import time
+
+import valkey.asyncio as valkey
+from wapprecommon import keys, listeners, model
+
+from wapprepollers import utils
+
+SNAPSHOT_REFRESH_INTERVAL_SECONDS = 10
+# A safeguard for clearing this if the snapshot loop breaks, backends fall back to
+# reading the individual keys
+SNAPSHOT_TTL_SECONDS = 60
+
+logger = logging.getLogger(__name__)
+
+
+class InitialStateSnapshot:
+    """Keeps the state sent to newly connected SocketIO clients up to date.
+
+    The snapshot combines the now playing, stream status and listener count
+    information for all radios into a single JSON value, so the backends can read it
+    with one round trip on client connect. It is rebuilt periodically and whenever a
+    now playing, stream status or listener count event is published.
+    """
+
+    def __init__(self, radios: list[model.Radio]) -> None:
+        """Initialize the snapshot.
+
+        Args:
+            radios: The radios to include in the snapshot.
+        """
+        self.radio_ids = [radio.id for radio in radios]
+        self.nowplaying_ids = [
+            radio.id
+            for radio in radios
+            if radio.current_song_type != model.CurrentSongType.NONE
+        ]
+        self.streamstatus_ids = [
+            radio.id for radio in radios if radio.stream_check_enabled
+        ]
+
+    async def build(self, valkey_client: valkey.Valkey) -> dict[str, Any]:
+        """Build the snapshot from the individual keys.
+
+        Args:
+            valkey_client: The Valkey client to use.
+
+        Returns:
+            The snapshot. Keys are SocketIO event names, values are the payloads the
+            events would have on their own.
+        """
+        values = await valkey_client.mget(
+            [keys.get_nowplaying_key(id) for id in self.nowplaying_ids]
+            + [keys.get_streamstatus_key(id) for id in self.streamstatus_ids]
+        )
+        nowplaying_values = values[: len(self.nowplaying_ids)]
+        streamstatus_values = values[len(self.nowplaying_ids) :]
+
+        return {
+            "now_playing": {
+                id: json.loads(value) if value else None
+                for id, value in zip(self.nowplaying_ids, nowplaying_values)
+            },
+            "stream_status": {
+                id: json.loads(value)
+                for id, value in zip(self.streamstatus_ids, streamstatus_values)
+                if value
+            },
+            "listeners": await listeners.get_listener_counts(
+                valkey_client, self.radio_ids
+            ),
+        }
+
+    async def refresh(self, valkey_client: valkey.Valkey) -> None:
+        """Rebuild and store the snapshot.
+
+        Args:
+            valkey_client: The Valkey client to use.
+        """
+        snapshot = await self.build(valkey_client)
+        await valkey_client.set(
+            keys.INITIAL_STATE_KEY, json.dumps(snapshot), ex=SNAPSHOT_TTL_SECONDS
+        )
+        logger.debug("Refreshed the initial state snapshot")
+
+    async def loop(self, valkey_client: valkey.Valkey) -> None:
+        """Keep the snapshot up to date in an infinite loop.
+
+        Args:
+            valkey_client: The Valkey client to use.
+        """
+        pubsub = valkey_client.pubsub()
+        try:
+            await pubsub.subscribe(
+                keys.NOWPLAYING_CHANNEL,
+                keys.STREAMSTATUS_CHANNEL,
+                keys.LISTENERS_CHANNEL,
+            )
+            while True:
+                await self.refresh(valkey_client)
+
+                deadline = time.monotonic() + SNAPSHOT_REFRESH_INTERVAL_SECONDS
+                while (remaining := deadline - time.monotonic()) > 0:
+                    message = await pubsub.get_message(
+                        ignore_subscribe_messages=True, timeout=remaining
+                    )
+                    if message is not None:
+                        break
+        finally:
+            await pubsub.aclose()
+
+    async def loop_wrapper(self, connection_pool: valkey.ConnectionPool) -> None:
+        """Keep the snapshot up to date in a loop while handling exceptions.
+
+        Args:
+            connection_pool: The Valkey connection pool to use.
+        """
+        await utils.loop_wrapper(
+            type="Snapshot",
+            id="initial_state",
+            loop_func=self.loop,
+            connection_pool=connection_pool,
+        )
@@ -8,13 +8,16 @@ import valkey.asyncio as valkey
 
 from wapprecommon import model, internal_model, keys
 
-from wapprepollers import utils
+from wapprepollers import http, scheduling, utils
 
 logger = logging.getLogger(__name__)
 
 STREAM_CHECKER_BYTES_TO_READ = 1024
 STREAM_CHECKER_TIMEOUT = aiohttp.ClientTimeout(total=10)  # (seconds)
 STREAM_CHECKER_INTERVAL_SECONDS = 30
+STREAM_CHECKER_MAX_UNCHANGED_INTERVAL_SECONDS = 60 * 2
+STREAM_CHECKER_MAX_OFFLINE_INTERVAL_SECONDS = 60 * 10
+STREAM_CHECKER_BOUNDARY_INTERVAL_SECONDS = 10
 M3U8_MIME_TYPES = ["application/x-mpegURL", "application/vnd.apple.mpegurl"]
 
 
@@ -28,6 +31,13 @@ class StreamChecker:
             radio: The radio whose streams to check.
         """
         self.radio = radio
+        self.scheduler = scheduling.PollScheduler(
+            radio_id=radio.id,
+            interval=STREAM_CHECKER_INTERVAL_SECONDS,
+            max_unchanged_interval=STREAM_CHECKER_MAX_UNCHANGED_INTERVAL_SECONDS,
+            max_offline_interval=STREAM_CHECKER_MAX_OFFLINE_INTERVAL_SECONDS,
+            boundary_interval=STREAM_CHECKER_BOUNDARY_INTERVAL_SECONDS,
+        )
 
     @property
     def cache_key(self) -> str:
@@ -96,26 +106,47 @@ class StreamChecker:
             is working.
         """
         tasks: dict[str, asyncio.Task[bool]] = {}
-        async with aiohttp.ClientSession() as session:
-            async with asyncio.TaskGroup() as tg:
-                for stream in self.radio.streams:
-                    is_m3u8 = stream.mime_type in M3U8_MIME_TYPES
-                    tasks[stream.url] = tg.create_task(
-                        self._check_stream(session, stream.url, is_m3u8)
-                    )
+        session = http.get_session()
+        async with asyncio.TaskGroup() as tg:
+            for stream in self.radio.streams:
+                is_m3u8 = stream.mime_type in M3U8_MIME_TYPES
+                tasks[stream.url] = tg.create_task(
+                    self._check_stream(session, stream.url, is_m3u8)
+                )
         return {url: task.result() for url, task in tasks.items()}
 
+    @property
+    def seq_key(self) -> str:
+        """Get the cache key for the sequence number of this radio's status events.
+
+        Returns:
+            The cache key for the sequence number.
+        """
+        return keys.get_streamstatus_seq_key(self.radio.id)
+
     async def update_status(
-        self, valkey_client: valkey.Valkey, status: dict[str, bool]
+        self,
+        valkey_client: valkey.Valkey,
+        status: dict[str, bool],
+        previous: dict[str, bool] | None = None,
     ) -> None:
         """Update the stream status in the cache & publish an event.
 
+        The full status is cached, but the event only contains the streams whose
+        status changed.
+
         Args:
             valkey_client: The Valkey client to use for caching.
             status: A dict mapping stream URLs to booleans indicating
                 whether the stream is working.
+            previous: The previously published status, or None to publish the full
+                status.
         """
         logger.info(f"Stream status for {self.radio.id}: {status}")
+        if previous is None:
+            changed = status
+        else:
+            changed = {url: ok for url, ok in status.items() if previous.get(url) != ok}
         await utils.store_and_publish(
             valkey_client=valkey_client,
             cache_key=self.cache_key,
@@ -123,8 +154,13 @@ class StreamChecker:
             event_channel=keys.STREAMSTATUS_CHANNEL,
             event=internal_model.StreamStatusEvent(
                 radio_id=self.radio.id,
-                stream_status=status,
+                stream_status=changed,
+                # Assigned by store_and_publish
+                seq=0,
+                full=previous is None,
             ).model_dump_json(),
+            event_stream=keys.EVENTS_STREAM_KEY,
+            seq_key=self.seq_key,
         )
 
     async def loop(self, valkey_client: valkey.Valkey) -> None:
@@ -134,13 +170,19 @@ class StreamChecker:
             valkey_client: The Valkey client to use for caching.
         """
         status = None
+        await asyncio.sleep(self.scheduler.initial_delay())
         while True:
             logger.info(f"Checking streams for {self.radio.id}")
             result = await self.check()
             if result != status:
+                await self.update_status(valkey_client, result, status)
                 status = result
-                await self.update_status(valkey_client, result)
-            await asyncio.sleep(STREAM_CHECKER_INTERVAL_SECONDS)
+                self.scheduler.record(scheduling.PollResult.CHANGED)
+            elif not any(result.values()):
+                self.scheduler.record(scheduling.PollResult.OFFLINE)
+            else:
+                self.scheduler.record(scheduling.PollResult.UNCHANGED)
+            await self.scheduler.sleep(valkey_client)
 
     async def loop_wrapper(self, connection_pool: valkey.ConnectionPool) -> None:
         """Check the streams in a loop while handling exceptions.
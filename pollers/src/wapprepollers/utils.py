@@ -3,10 +3,28 @@ import asyncio
 import logging
 
 import valkey.asyncio as valkey
+from valkey.asyncio.client import Pipeline
 
 logger = logging.getLogger(__name__)
 
 LOOP_WRAPPER_RESTART_DELAY_SECONDS = 60
+# Roughly how many events to keep in the event stream
+EVENTS_STREAM_MAXLEN = 1000
+# Numbers an event with the next value of a counter, then publishes it and appends
+# it to the event stream if one is given
+# KEYS[1]: the counter, KEYS[2]: the optional event stream
+# ARGV[1]: the channel, ARGV[2]: the event as a JSON object, ARGV[3]: stream maxlen
+PUBLISH_NUMBERED_SCRIPT = """
+local event = cjson.decode(ARGV[2])
+event.seq = redis.call("INCR", KEYS[1])
+local data = cjson.encode(event)
+if KEYS[2] then
+    redis.call(
+        "XADD", KEYS[2], "MAXLEN", "~", ARGV[3], "*", "channel", ARGV[1], "data", data
+    )
+end
+return redis.call("PUBLISH", ARGV[1], data)
+"""
 
 
 async def loop_wrapper(
@@ -47,9 +65,15 @@ async def store_and_publish(
     event_channel: str,
     event: str,
     cache_ttl_seconds: int | None = None,
+    event_stream: str | None = None,
+    extra_commands: Callable[[Pipeline], object] | None = None,
+    seq_key: str | None = None,
 ) -> None:
     """Store a value in the cache and publish an event.
 
+    Both are done in a single transaction, so a backend that sees the event can't
+    read the old value.
+
     Args:
         valkey_client: The Valkey client to use for caching and publishing.
         cache_key: The key to store the value under in the cache.
@@ -58,23 +82,46 @@ async def store_and_publish(
         event_channel: The channel to publish the event to.
         event: The event to publish.
         cache_ttl_seconds: Optional TTL for the cached value, in seconds.
+        event_stream: Optional stream to also append the event to, for consumers
+            that need to catch up on missed events.
+        extra_commands: Optional function that queues more commands to run in the
+            same transaction, before the event is published.
+        seq_key: Optional key of a counter to number the events with. The event's
+            seq field is set to the counter's next value in the same transaction,
+            so a failed transaction doesn't skip a number.
     """
-    if cache_value is None:
-        await valkey_client.delete(cache_key)
-    else:
-        await valkey_client.set(
-            cache_key,
-            cache_value,
-            ex=cache_ttl_seconds,
-        )
+    async with valkey_client.pipeline(transaction=True) as pipe:
+        if cache_value is None:
+            pipe.delete(cache_key)
+        else:
+            pipe.set(cache_key, cache_value, ex=cache_ttl_seconds)
+        if extra_commands is not None:
+            extra_commands(pipe)
+        if seq_key is not None:
+            numbered_keys = (
+                [seq_key] if event_stream is None else [seq_key, event_stream]
+            )
+            pipe.eval(
+                PUBLISH_NUMBERED_SCRIPT,
+                len(numbered_keys),
+                *numbered_keys,
+                event_channel,
+                event,
+                str(EVENTS_STREAM_MAXLEN),
+            )
+        else:
+            if event_stream is not None:
+                pipe.xadd(
+                    event_stream,
+                    {"channel": event_channel, "data": event},
+                    maxlen=EVENTS_STREAM_MAXLEN,
+                    approximate=True,
+                )
+            pipe.publish(event_channel, event)
+        *_, n = await pipe.execute()
 
-    n = await valkey_client.publish(event_channel, event)
-    log = f"Updated {cache_key} and published event to {event_channel}"
-    if n == 0:
-        logger.warning(f"{log} (no Valkey subscribers!)")
-        logger.warning(
-            f"Sent to: {event_channel}, "
-            f"channels with subscribers: {await valkey_client.pubsub_channels()}"
-        )
-    else:
-        logger.info(f"{log} ({n} Valkey subscriber(s))")
+    # Missing subscribers are reported by housekeeping.check_subscribers
+    logger.info(
+        f"Updated {cache_key} and published event to {event_channel} "
+        f"({n} Valkey subscriber(s))"
+    )
@@ -176,6 +176,11 @@ resource "kubernetes_deployment_v1" "backend" {
             value = "valkey://${kubernetes_service_v1.valkey.metadata[0].name}:6379"
           }
 
+          env {
+            name  = "SOCKETIO_VALKEY_MANAGER"
+            value = "true"
+          }
+
           resources {
             requests = {
               cpu    = var.backend_cpu_request